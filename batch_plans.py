@@ -0,0 +1,122 @@
+import argparse
+import csv
+import json
+import sys
+
+import numpy as np
+
+from caloric_needs import ACTIVITY_LEVELS, calculate_bmr_array, calculate_tdee_array
+from meal_planner import prepare_menu, plan_day
+
+PROFILE_COLUMNS = ['user_id', 'weight', 'height', 'age', 'gender', 'activity', 'chain']
+
+
+def compute_tdee_frame(profiles, bucket_size=50):
+    # weight in kg and height in cm, as calculate_bmr expects
+    bmr = calculate_bmr_array(profiles['weight'], profiles['height'], profiles['age'], profiles['gender'])
+    tdee = calculate_tdee_array(bmr, profiles['activity'])
+    # A missing gender or an unknown activity would silently fall back to the
+    # female formula or 1.2, so those users get a NaN TDEE like missing numbers do.
+    invalid = profiles['gender'].isna() | ~profiles['activity'].astype(str).str.lower().isin(list(ACTIVITY_LEVELS))
+    tdee = np.where(invalid.to_numpy(), np.nan, tdee)
+    out = profiles.copy()
+    out['tdee'] = tdee
+    # Float so users with a missing weight, height or age keep a NaN bucket.
+    out['bucket'] = np.round(tdee / bucket_size) * bucket_size
+    return out
+
+
+class JsonlWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, record):
+        self.stream.write(json.dumps(record) + "\n")
+
+
+class CsvWriter:
+    fields = ['user_id', 'chain', 'tdee', 'bucket', 'meal', 'items', 'calories', 'protein', 'fat', 'carbs', 'error']
+
+    def __init__(self, stream):
+        self.writer = csv.DictWriter(stream, fieldnames=self.fields)
+        self.writer.writeheader()
+
+    def write(self, record):
+        if 'error' in record:
+            self.writer.writerow({'user_id': record['user_id'], 'chain': record['chain'], 'error': record['error']})
+            return
+        for i, meal in enumerate(record['meals']):
+            self.writer.writerow({
+                'user_id': record['user_id'], 'chain': record['chain'],
+                'tdee': record['tdee'], 'bucket': record['bucket'], 'meal': i + 1,
+                'items': " | ".join(meal['items']), 'calories': meal['calories'],
+                'protein': meal['protein'], 'fat': meal['fat'], 'carbs': meal['carbs'],
+            })
+
+
+def generate_plans(profile_chunks, df_raw, writer, bucket_size=50, mode='knapsack'):
+    # Each distinct (chain, calorie bucket) is solved once and fanned out to
+    # every user in it; plans are kept across chunks so later chunks reuse them.
+    # Users without a known chain or a computable TDEE get a record with an error.
+    chains = set(df_raw['Company'].dropna().str.lower())
+    menus, plans = {}, {}
+    written = failed = 0
+    for chunk in profile_chunks:
+        chunk = compute_tdee_frame(chunk, bucket_size)
+        for (chain, bucket), group in chunk.groupby(['chain', 'bucket'], sort=False, dropna=False):
+            if not isinstance(chain, str) or not chain.strip():
+                error = "Missing chain."
+            elif chain.lower() not in chains:
+                error = "Unknown chain."
+            elif np.isnan(bucket):
+                error = "Missing or invalid weight, height, age, gender or activity."
+            else:
+                error = None
+            if error is not None:
+                for user_id in group['user_id'].tolist():
+                    writer.write({'user_id': user_id, 'chain': chain if isinstance(chain, str) else None,
+                                  'tdee': None, 'bucket': None, 'meals': [], 'error': error})
+                failed += len(group)
+                continue
+
+            key = (chain, bucket)
+            if key not in plans:
+                if chain not in menus:
+                    menus[chain] = prepare_menu(df_raw, chain)
+                meals = plan_day(menus[chain], bucket, mode)
+                plans[key] = [{k: v for k, v in meal.items() if k != 'rows'} for meal in meals]
+            for user_id, tdee in zip(group['user_id'].tolist(), group['tdee'].tolist()):
+                writer.write({'user_id': user_id, 'chain': chain, 'tdee': round(tdee, 2),
+                              'bucket': int(bucket), 'meals': plans[key]})
+                written += 1
+    return written, len(plans), failed
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    from data_loader import load_and_process_data, DEFAULT_CACHE_DIR
+
+    parser = argparse.ArgumentParser(description="Generate daily meal plans for a table of user profiles.")
+    parser.add_argument("profiles", help="CSV with columns " + ", ".join(PROFILE_COLUMNS) + " (weight in kg, height in cm)")
+    parser.add_argument("--data", default="FastFoodNutritionMenuV2.csv")
+    parser.add_argument("--output", default="-")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--mode", choices=["greedy", "knapsack"], default="knapsack")
+    parser.add_argument("--bucket-size", type=int, default=50)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    _, _, df_raw = load_and_process_data(args.data, DEFAULT_CACHE_DIR, with_raw=True)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    writer = JsonlWriter(out) if args.format == "jsonl" else CsvWriter(out)
+    chunks = pd.read_csv(args.profiles, usecols=PROFILE_COLUMNS, chunksize=args.chunk_size)
+    try:
+        written, solved, failed = generate_plans(chunks, df_raw, writer, args.bucket_size, args.mode)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Wrote {written} plans from {solved} distinct solves.", file=sys.stderr)
+    if failed:
+        print(f"{failed} users had no plan (missing or unknown chain, or invalid profile fields); see their 'error' records.",
+              file=sys.stderr)
@@ -0,0 +1,236 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import re
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from data_loader import FEATURES, load_and_process_data
+from dominance_index import DominanceIndex
+from health_score import (ScoringEngine, compute_health_score, get_healthier_alternatives,
+                          get_healthier_alternatives_batch, score_frame)
+from meal_planner import plan_day, prepare_menu
+from name_index import NameIndex
+
+# 1m is left to --sizes: building the pure-Python NameIndex alone takes
+# seconds and hundreds of MB per 100k rows.
+DEFAULT_SIZES = ['bundled', '10k', '100k']
+# The dominance table is built from an (n, n) comparison, so past this size the
+# indexed lookups are skipped rather than spending minutes on setup.
+INDEX_MAX_ROWS = 20_000
+PLAN_TDEES = (1800, 2400, 3200)
+
+
+def parse_size(size):
+    if size == 'bundled':
+        return None
+    size = size.lower()
+    for suffix, factor in (('k', 1_000), ('m', 1_000_000)):
+        if size.endswith(suffix):
+            return int(float(size[:-len(suffix)]) * factor)
+    return int(size)
+
+
+def synthesize_menu(df_raw, rows, seed=0):
+    # Resamples whole menu rows (so chain mix and nutrient correlations carry
+    # over) and jitters every nutrient with ~10% lognormal noise.
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(df_raw), rows)
+    out = df_raw.iloc[picks].reset_index(drop=True)
+    noise = rng.lognormal(0.0, 0.1, size=(rows, len(FEATURES)))
+    out[FEATURES] = np.round(out[FEATURES].to_numpy(dtype=np.float64) * noise, 1)
+    out['Item'] = out['Item'].astype(str) + ' #' + np.arange(rows).astype(str)
+    return out
+
+
+def write_menu_csv(df, path):
+    # Column names go back to the bundled CSV's spelling so the loader parses
+    # synthetic files exactly like the real one.
+    renamed = {col: col.replace('_', ' ').replace('(', '\n(') for col in FEATURES}
+    df.rename(columns=renamed).to_csv(path, index=False)
+
+
+def summarize(samples, units=1):
+    samples = np.asarray(samples, dtype=np.float64)
+    return {
+        'runs': len(samples),
+        'units': units,
+        'mean_ms': float(samples.mean() * 1000),
+        'min_ms': float(samples.min() * 1000),
+        'p50_ms': float(np.percentile(samples, 50) * 1000),
+        'p90_ms': float(np.percentile(samples, 90) * 1000),
+        'p99_ms': float(np.percentile(samples, 99) * 1000),
+        'max_ms': float(samples.max() * 1000),
+        'throughput_per_s': float(units / np.median(samples)) if np.median(samples) > 0 else float('inf'),
+    }
+
+
+def run_case(fn, repeat=5, warmup=1, units=1):
+    # Timed runs go without tracemalloc; one extra traced run records the peak.
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = summarize(samples, units)
+    result['peak_mb'] = peak / (1 << 20)
+    return result
+
+
+def run_each(fn, args, units_per_call=1):
+    # Per-call latencies for one-query-at-a-time paths.
+    samples = []
+    for arg in args:
+        start = time.perf_counter()
+        fn(arg)
+        samples.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    fn(args[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = summarize(samples, units_per_call)
+    result['peak_mb'] = peak / (1 << 20)
+    return result
+
+
+def benchmark_dataset(path, queries=100, repeat=5, index_max_rows=INDEX_MAX_ROWS, seed=0, only=None):
+    results = {}
+
+    def wanted(name):
+        return only is None or any(name.startswith(prefix) for prefix in only)
+
+    cache_dir = tempfile.mkdtemp(prefix='bench-cache-')
+    try:
+        if wanted('load.parse'):
+            results['load.parse'] = run_case(lambda: load_and_process_data(path), repeat, warmup=0)
+        load_and_process_data(path, cache_dir)
+        if wanted('load.cached'):
+            results['load.cached'] = run_case(lambda: load_and_process_data(path, cache_dir), repeat)
+        df, features, df_raw = load_and_process_data(path, cache_dir, with_raw=True)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    n = len(df)
+    for result in results.values():
+        result['units'] = n
+        result['throughput_per_s'] = n / (result['p50_ms'] / 1000)
+
+    if wanted('score'):
+        scored = df[features].copy()
+        results['score.compute_health_score'] = run_case(lambda: compute_health_score(scored, features), repeat, units=n)
+        results['score.engine_all_profiles'] = run_case(lambda: ScoringEngine(df).scores(), repeat, units=n)
+    scoring = ScoringEngine(df)
+    df_scored = score_frame(df, engine=scoring)
+
+    rng = np.random.default_rng(seed)
+    names = df['Item'].to_numpy()[rng.integers(0, n, queries)].tolist()
+    # Unindexed scans are linear per query, so large menus time fewer of them.
+    # find_item's scan is a regex match, so names are escaped to stay literal.
+    scan_names = [re.escape(name) for name in (names if n <= index_max_rows else names[:20])]
+
+    if wanted('alternatives.scan'):
+        results['alternatives.scan'] = run_each(
+            lambda name: get_healthier_alternatives(name, df, df_scored), scan_names)
+
+    if n <= index_max_rows and (wanted('index') or wanted('alternatives.indexed')):
+        start = time.perf_counter()
+        name_index = NameIndex.from_frame(df)
+        dominance_index = DominanceIndex.from_frames(df, df_scored)
+        results['index.build'] = summarize([time.perf_counter() - start], n)
+        if wanted('alternatives.indexed'):
+            results['alternatives.indexed'] = run_each(
+                lambda name: get_healthier_alternatives(name, df, df_scored, name_index=name_index,
+                                                        dominance_index=dominance_index), names)
+    else:
+        name_index = NameIndex.from_frame(df) if wanted('alternatives.batch') else None
+
+    if wanted('alternatives.batch'):
+        results['alternatives.batch'] = run_case(
+            lambda: get_healthier_alternatives_batch(names, df, df_scored, name_index=name_index),
+            repeat, units=len(names))
+
+    chains = sorted(df_raw['Company'].dropna().unique().tolist())
+    for mode in ('greedy', 'knapsack'):
+        if not wanted(f'plan.{mode}'):
+            continue
+
+        def plan_all(mode=mode):
+            # Headless equivalent of NutritionApp.recommend_meals for every chain and TDEE.
+            for chain in chains:
+                menu = prepare_menu(df_raw, chain)
+                for tdee in PLAN_TDEES:
+                    plan_day(menu, tdee, mode)
+
+        results[f'plan.{mode}'] = run_case(plan_all, repeat, units=len(chains) * len(PLAN_TDEES))
+
+    return n, results
+
+
+def compare(results, baseline):
+    lines = []
+    for dataset, cases in results.items():
+        for name, result in cases['cases'].items():
+            base = baseline.get(dataset, {}).get('cases', {}).get(name)
+            line = f"{dataset:<8} {name:<28} p50 {result['p50_ms']:10.2f} ms  p99 {result['p99_ms']:10.2f} ms  " \
+                   f"{result['throughput_per_s']:12.1f}/s  peak {result.get('peak_mb', 0):8.1f} MB"
+            if base:
+                line += f"  ({(result['p50_ms'] / base['p50_ms'] - 1) * 100:+.1f}% p50)"
+            lines.append(line)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark loading, scoring, alternatives and meal planning.")
+    parser.add_argument("--data", default="FastFoodNutritionMenuV2.csv")
+    parser.add_argument("--sizes", nargs="*", default=DEFAULT_SIZES,
+                        help="'bundled' and/or synthetic row counts such as 10k, 100k, 1m.")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--index-max-rows", type=int, default=INDEX_MAX_ROWS)
+    parser.add_argument("--only", nargs="*", help="Run only cases whose names start with these prefixes.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Write the results to this file.")
+    parser.add_argument("--baseline", help="Compare against results previously written with --json.")
+    args = parser.parse_args()
+
+    _, _, bundled_raw = load_and_process_data(args.data, with_raw=True)
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    results = {}
+    try:
+        for size in args.sizes:
+            rows = parse_size(size)
+            path = args.data
+            if rows is not None:
+                path = os.path.join(workdir, f"menu-{rows}.csv")
+                write_menu_csv(synthesize_menu(bundled_raw, rows, args.seed), path)
+            n, cases = benchmark_dataset(path, args.queries, args.repeat, args.index_max_rows, args.seed, args.only)
+            results[size] = {'rows': n, 'cases': cases}
+            print(compare({size: results[size]}, {}), flush=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print("\nAgainst baseline:")
+            print(compare(results, json.load(f)))
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({**results, '_meta': {'python': platform.python_version(), 'numpy': np.__version__,
+                                            'machine': platform.machine(), 'time': time.time()}}, f, indent=2)
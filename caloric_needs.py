@@ -1,3 +1,10 @@
+import numpy as np
+
+ACTIVITY_LEVELS = {
+    'sedentary': 1.2, 'lightly active': 1.375,
+    'moderately active': 1.55, 'very active': 1.725, 'extra active': 1.9
+}
+
 def calculate_bmr(weight, height, age, gender):
     return (
         88.362 + (13.397 * weight) + (4.799 * height) - (5.677 * age)
@@ -6,8 +13,21 @@ def calculate_bmr(weight, height, age, gender):
     )
 
 def calculate_tdee(bmr, activity_level):
-    levels = {
-        'sedentary': 1.2, 'lightly active': 1.375,
-        'moderately active': 1.55, 'very active': 1.725, 'extra active': 1.9
-    }
-    return bmr * levels.get(activity_level.lower(), 1.2)
+    return bmr * ACTIVITY_LEVELS.get(activity_level.lower(), 1.2)
+
+def calculate_bmr_array(weight, height, age, gender):
+    # Vectorized calculate_bmr; gender is an array of strings.
+    male = np.char.lower(np.asarray(gender, dtype=str)) == 'male'
+    weight, height, age = (np.asarray(v, dtype=np.float64) for v in (weight, height, age))
+    return np.where(
+        male,
+        88.362 + (13.397 * weight) + (4.799 * height) - (5.677 * age),
+        447.593 + (9.247 * weight) + (3.098 * height) - (4.330 * age),
+    )
+
+def calculate_tdee_array(bmr, activity_level):
+    levels = np.char.lower(np.asarray(activity_level, dtype=str))
+    factors = np.full(levels.shape, 1.2)
+    for name, factor in ACTIVITY_LEVELS.items():
+        factors[levels == name] = factor
+    return np.asarray(bmr, dtype=np.float64) * factors
@@ -1,18 +1,400 @@
-import pandas as pd
-from sklearn.preprocessing import StandardScaler
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
 
-def load_and_process_data(file_path):
-    df = pd.read_csv(file_path)
-    df.columns = [col.strip().replace('\n', '').replace(' ', '_') for col in df.columns]
+import numpy as np
 
-    features = ['Calories', 'Total_Fat(g)', 'Saturated_Fat(g)', 'Trans_Fat(g)', 
-                'Cholesterol(mg)', 'Sodium_(mg)', 'Carbs(g)', 'Fiber(g)', 
-                'Sugars(g)', 'Protein(g)']
+from instrumentation import stage
+from schema import NUTRIENTS, MenuArrays, MenuSchema, clean_column
 
-    df[features] = df[features].apply(pd.to_numeric, errors='coerce')
-    df.dropna(subset=features, inplace=True)
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = '.menu_cache'
 
-    scaler = StandardScaler()
-    df[features] = scaler.fit_transform(df[features])
+FEATURES = list(NUTRIENTS.values())
 
-    return df, features
+
+def file_fingerprint(file_path, with_hash=True):
+    st = os.stat(file_path)
+    fp = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    if with_hash:
+        h = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        fp['sha256'] = h.hexdigest()
+    return fp
+
+
+def _handle_zero_scale(scale):
+    # A scale of 1 for (near-)constant columns so they standardize to 0 instead of NaN.
+    scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0
+    return scale
+
+
+def standard_scaler_fit(raw):
+    # Same statistics as sklearn's StandardScaler: population std, with
+    # constant columns left unscaled.
+    mean = raw.mean(axis=0)
+    scale = _handle_zero_scale(np.sqrt(((raw - mean) ** 2).mean(axis=0)))
+    return mean, scale
+
+
+def dataset_version(file_path, cache_dir=None):
+    # A fresh cache already holds the source's content hash, so a warm start
+    # only stats the file instead of reading all of it again.
+    if cache_dir is not None:
+        meta = _read_meta(cache_path(file_path, cache_dir))
+        if meta is not None and _cache_is_fresh(meta, file_path):
+            return meta['source']['sha256'][:16]
+    return file_fingerprint(file_path)['sha256'][:16]
+
+
+def cache_path(file_path, cache_dir):
+    abs_path = os.path.abspath(file_path)
+    tag = hashlib.sha256(abs_path.encode('utf-8')).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(abs_path))[0]
+    return os.path.join(cache_dir, f"{stem}-{tag}")
+
+
+def _resolve_columns(df):
+    # Cleans the header and renames any variant spellings to the canonical
+    # names; raises ValueError naming the columns the menu lacks.
+    df.columns = [clean_column(col) for col in df.columns]
+    schema = MenuSchema(df.columns)
+    if schema.renames():
+        df.rename(columns=schema.renames(), inplace=True)
+    return df
+
+
+def _parse_csv(file_path):
+    import pandas as pd
+
+    with stage('load.read_csv') as s:
+        df = pd.read_csv(file_path)
+        s['rows'] = len(df)
+    _resolve_columns(df)
+
+    with stage('load.coerce') as s:
+        df[FEATURES] = df[FEATURES].apply(pd.to_numeric, errors='coerce')
+        df.dropna(subset=FEATURES, inplace=True)
+        s['rows'] = len(df)
+
+    with stage('load.scale', rows=len(df)):
+        raw = df[FEATURES].to_numpy(dtype=np.float64)
+        mean, scale = standard_scaler_fit(raw)
+        scaled = (raw - mean) / scale
+    return df, raw, scaled, mean, scale
+
+
+def _write_cache(path, fingerprint, df, raw, scaled, mean, scale):
+    import pandas as pd
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix='.tmp-', dir=os.path.dirname(path))
+
+    others = []
+    for i, col in enumerate(c for c in df.columns if c not in FEATURES):
+        series = df[col]
+        name = f"col{i}"
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            np.save(os.path.join(tmp, f"{name}.npy"), series.to_numpy())
+            others.append({'name': col, 'file': name, 'kind': 'numeric'})
+        else:
+            mask = series.isna().to_numpy()
+            values = series.fillna('').astype(str).to_numpy(dtype=np.str_)
+            np.save(os.path.join(tmp, f"{name}.npy"), values)
+            np.save(os.path.join(tmp, f"{name}_na.npy"), mask)
+            others.append({'name': col, 'file': name, 'kind': 'string'})
+
+    np.save(os.path.join(tmp, 'index.npy'), df.index.to_numpy(dtype=np.int64))
+    np.save(os.path.join(tmp, 'raw.npy'), raw)
+    np.save(os.path.join(tmp, 'scaled.npy'), scaled)
+    np.save(os.path.join(tmp, 'mean.npy'), mean)
+    np.save(os.path.join(tmp, 'scale.npy'), scale)
+
+    meta = {
+        'version': CACHE_VERSION,
+        'source': fingerprint,
+        'columns': list(df.columns),
+        'features': FEATURES,
+        'others': others,
+    }
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    if os.path.isdir(path):
+        stale = tempfile.mkdtemp(prefix='.stale-', dir=os.path.dirname(path))
+        os.replace(path, os.path.join(stale, 'old'))
+        os.replace(tmp, path)
+        shutil.rmtree(stale, ignore_errors=True)
+    else:
+        os.replace(tmp, path)
+
+
+def _read_meta(path):
+    try:
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != CACHE_VERSION or meta.get('features') != FEATURES:
+        return None
+    return meta
+
+
+def _cache_is_fresh(meta, file_path):
+    source = meta['source']
+    fp = file_fingerprint(file_path, with_hash=False)
+    if fp['size'] != source['size']:
+        return False
+    if fp['mtime_ns'] == source['mtime_ns']:
+        return True
+    # Touched but possibly unchanged: fall back to the content hash.
+    return file_fingerprint(file_path)['sha256'] == source['sha256']
+
+
+def _read_cache(path, meta, mmap_mode='r'):
+    import pandas as pd
+
+    def load(name):
+        return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+
+    index = pd.Index(np.asarray(load('index')))
+    raw = load('raw')
+    scaled = load('scaled')
+
+    data = {}
+    for other in meta['others']:
+        values = load(other['file'])
+        if other['kind'] == 'numeric':
+            data[other['name']] = np.array(values)
+        else:
+            values = np.asarray(values).astype(object)
+            values[np.asarray(load(f"{other['file']}_na"))] = np.nan
+            data[other['name']] = values
+    for j, feature in enumerate(FEATURES):
+        data[feature] = np.array(raw[:, j])
+
+    df = pd.DataFrame({col: data[col] for col in meta['columns']}, index=index)
+    return df, raw, scaled, np.asarray(load('mean')), np.asarray(load('scale'))
+
+
+def load_processed_arrays(file_path, cache_dir=None):
+    # Returns the cleaned frame in raw units plus the raw/standardized feature
+    # blocks and scaler statistics, served from cache_dir when it is still valid.
+    if cache_dir is None:
+        return _parse_csv(file_path)
+
+    path = cache_path(file_path, cache_dir)
+    meta = _read_meta(path)
+    if meta is not None and _cache_is_fresh(meta, file_path):
+        with stage('load.cache_read') as s:
+            result = _read_cache(path, meta)
+            s['rows'] = len(result[0])
+        return result
+
+    fingerprint = file_fingerprint(file_path)
+    df, raw, scaled, mean, scale = _parse_csv(file_path)
+    try:
+        with stage('load.cache_write', rows=len(df)):
+            _write_cache(path, fingerprint, df, raw, scaled, mean, scale)
+    except OSError:
+        pass
+    return df, raw, scaled, mean, scale
+
+
+def memory_footprint(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _compact_strings(series):
+    import pandas as pd
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        values = [sys.intern(v) if isinstance(v, str) else v for v in series.tolist()]
+        return pd.Series(np.array(values, dtype=object), index=series.index, name=series.name)
+    return series.astype('string[pyarrow]')
+
+
+def compact_frame(df, features=FEATURES):
+    import pandas as pd
+
+    # Categorical Company, Arrow-backed (or interned) Item strings and float32
+    # nutrients. The before/after footprint is kept in df.attrs.
+    before = memory_footprint(df)
+    out = pd.DataFrame(index=df.index)
+    for col in df.columns:
+        if col in features:
+            out[col] = df[col].astype(np.float32)
+        elif col == 'Company':
+            # '' is added as a category so consumers can still fillna('') missing chains.
+            out[col] = df[col].astype('category')
+            if out[col].isna().any():
+                out[col] = out[col].cat.add_categories([''])
+        elif col == 'Item':
+            out[col] = _compact_strings(df[col])
+        else:
+            out[col] = df[col]
+    out.attrs['memory_footprint'] = {'before': before, 'after': memory_footprint(out)}
+    return out
+
+
+def load_and_process_data(file_path, cache_dir=None, with_raw=False, compact=False):
+    with stage('load.total', cache=cache_dir is not None) as s:
+        df, raw, scaled, mean, scale = load_processed_arrays(file_path, cache_dir)
+        s['rows'] = len(df)
+        df_raw = None
+        if with_raw:
+            df_raw = compact_frame(df) if compact else df.copy()
+        df[FEATURES] = np.asarray(scaled)
+        if compact:
+            df = compact_frame(df)
+    if with_raw:
+        return df, list(FEATURES), df_raw
+    return df, list(FEATURES)
+
+
+def load_menu(file_path, cache_dir=None):
+    # Same data as load_and_process_data(with_raw=True), resolved against the
+    # schema once and exposed as contiguous raw/standardized feature blocks.
+    with stage('load.total', cache=cache_dir is not None) as s:
+        df, raw, scaled, mean, scale = load_processed_arrays(file_path, cache_dir)
+        s['rows'] = len(df)
+        df_raw = df.copy()
+        df[FEATURES] = np.asarray(scaled)
+        return MenuArrays(MenuSchema(df.columns), df.index.to_numpy(), df['Item'].to_numpy(),
+                          df['Company'].fillna('').to_numpy(), raw, scaled, mean, scale, df, df_raw)
+
+
+STREAM_STRING_COLUMNS = ['Company', 'Item']
+
+
+def merge_stats(count, mean, m2, chunk):
+    # Chan et al. parallel update of running mean / sum of squared deviations.
+    n_b = len(chunk)
+    if n_b == 0:
+        return count, mean, m2
+    mean_b = chunk.mean(axis=0)
+    m2_b = ((chunk - mean_b) ** 2).sum(axis=0)
+    total = count + n_b
+    delta = mean_b - mean
+    mean = mean + delta * (n_b / total)
+    m2 = m2 + m2_b + delta ** 2 * (count * n_b / total)
+    return total, mean, m2
+
+
+def remove_stats(count, mean, m2, chunk):
+    # Inverse of merge_stats: take a batch of previously merged rows back out.
+    n_b = len(chunk)
+    if n_b == 0:
+        return count, mean, m2
+    remaining = count - n_b
+    if remaining <= 0:
+        return 0, np.zeros_like(mean), np.zeros_like(m2)
+    mean_b = chunk.mean(axis=0)
+    m2_b = ((chunk - mean_b) ** 2).sum(axis=0)
+    mean_a = (count * mean - n_b * mean_b) / remaining
+    delta = mean_b - mean_a
+    m2 = np.maximum(m2 - m2_b - delta ** 2 * (remaining * n_b / count), 0.0)
+    return remaining, mean_a, m2
+
+
+class StreamedMenu:
+    # Standardized menu written by stream_process_data: the raw block as the
+    # flat float64 file spooled in pass one, the scaled block as a .npy file,
+    # both memory-mapped, plus per-chunk string tables.
+
+    def __init__(self, out_dir):
+        with open(os.path.join(out_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.out_dir = out_dir
+        self.features = self.meta['features']
+        shape = (self.meta['rows'], len(self.features))
+        if self.meta['rows']:
+            self.raw = np.memmap(os.path.join(out_dir, 'raw.f64'), dtype=np.float64, mode='r', shape=shape)
+        else:
+            self.raw = np.empty(shape)
+        self.scaled = np.load(os.path.join(out_dir, 'scaled.npy'), mmap_mode='r')
+        self.index = np.load(os.path.join(out_dir, 'index.npy'), mmap_mode='r')
+        self.mean = np.load(os.path.join(out_dir, 'mean.npy'))
+        self.scale = np.load(os.path.join(out_dir, 'scale.npy'))
+
+    def __len__(self):
+        return len(self.raw)
+
+    def iter_chunks(self, chunk_rows=None):
+        chunk_rows = chunk_rows or self.meta['chunk_rows']
+        for start in range(0, len(self), chunk_rows):
+            yield start, self.raw[start:start + chunk_rows], self.scaled[start:start + chunk_rows]
+
+    def strings(self, col, start=0, stop=None):
+        stop = len(self) if stop is None else min(stop, len(self))
+        parts = []
+        for chunk in self.meta['string_chunks']:
+            lo, hi = chunk['start'], chunk['start'] + chunk['rows']
+            if hi <= start or lo >= stop:
+                continue
+            values = np.load(os.path.join(self.out_dir, chunk['files'][col]))
+            parts.append(values[max(start, lo) - lo:min(stop, hi) - lo])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=str)
+
+
+def stream_process_data(file_path, out_dir, chunk_rows=100_000):
+    import pandas as pd
+
+    # Same cleaning as load_and_process_data, but one chunk at a time: pass one
+    # coerces/drops rows, writes raw values to disk and accumulates mean/variance;
+    # pass two reads them back and writes the standardized block. Peak memory
+    # is O(chunk_rows).
+    os.makedirs(out_dir, exist_ok=True)
+    spool_path = os.path.join(out_dir, 'raw.f64')
+    index_spool_path = os.path.join(out_dir, 'index.spool')
+
+    count, mean, m2 = 0, np.zeros(len(FEATURES)), np.zeros(len(FEATURES))
+    string_chunks = []
+    with open(spool_path, 'wb') as spool, open(index_spool_path, 'wb') as index_spool:
+        for k, chunk in enumerate(pd.read_csv(file_path, chunksize=chunk_rows)):
+            _resolve_columns(chunk)
+            chunk[FEATURES] = chunk[FEATURES].apply(pd.to_numeric, errors='coerce')
+            chunk.dropna(subset=FEATURES, inplace=True)
+
+            raw = chunk[FEATURES].to_numpy(dtype=np.float64)
+            spool.write(raw.tobytes())
+            index_spool.write(chunk.index.to_numpy(dtype=np.int64).tobytes())
+
+            files = {}
+            for col in STREAM_STRING_COLUMNS:
+                name = f"{col.lower()}-{k:05d}.npy"
+                np.save(os.path.join(out_dir, name), chunk[col].fillna('').astype(str).to_numpy(dtype=np.str_))
+                files[col] = name
+            string_chunks.append({'start': count, 'rows': len(raw), 'files': files})
+            count, mean, m2 = merge_stats(count, mean, m2, raw)
+
+    scale = _handle_zero_scale(np.sqrt(m2 / count)) if count else np.ones(len(FEATURES))
+
+    scaled_out = np.lib.format.open_memmap(os.path.join(out_dir, 'scaled.npy'), mode='w+',
+                                           dtype=np.float64, shape=(count, len(FEATURES)))
+    if count:
+        spooled = np.memmap(spool_path, dtype=np.float64, mode='r', shape=(count, len(FEATURES)))
+        for start in range(0, count, chunk_rows):
+            block = np.asarray(spooled[start:start + chunk_rows])
+            scaled_out[start:start + len(block)] = (block - mean) / scale
+        del spooled
+    scaled_out.flush()
+    del scaled_out
+
+    index = np.fromfile(index_spool_path, dtype=np.int64)
+    np.save(os.path.join(out_dir, 'index.npy'), index)
+    np.save(os.path.join(out_dir, 'mean.npy'), mean)
+    np.save(os.path.join(out_dir, 'scale.npy'), scale)
+    os.remove(index_spool_path)
+
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump({'features': FEATURES, 'rows': int(count), 'chunk_rows': chunk_rows,
+                   'string_chunks': string_chunks, 'source': file_fingerprint(file_path)}, f)
+    return StreamedMenu(out_dir)
@@ -0,0 +1,183 @@
+import hashlib
+import os
+
+import numpy as np
+
+from health_score import DOMINANCE_COLUMNS, dominance_mask
+
+INDEX_VERSION = 2
+
+
+def _content_key(values, health, max_top_n):
+    h = hashlib.sha256()
+    h.update(f"{INDEX_VERSION}:{max_top_n}:".encode())
+    h.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    h.update(np.ascontiguousarray(health, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+class DominanceIndex:
+    # Materialized dominance lists: rows are kept healthiest first, and for
+    # every menu row the first max_top_n rows that dominate it on the five
+    # DOMINANCE_COLUMNS are stored, so looking up an item's alternatives is a
+    # dict hit plus k reads. Points that are not menu rows (or top_n larger than
+    # the stored lists) fall back to a blocked scan in that order that stops
+    # as soon as k dominators have been seen.
+
+    def __init__(self, values, health, labels, table, key):
+        # Own writable copies so the row-level patches below never touch caller memory.
+        self.values = np.array(values, dtype=np.float64)
+        self.health = np.array(health, dtype=np.float64)
+        self.labels = np.asarray(labels)
+        self.table = np.array(table)
+        self.key = key
+        self.max_top_n = self.table.shape[1]
+        self._resort()
+        self.positions = {label: pos for pos, label in enumerate(self.labels.tolist())}
+
+    @classmethod
+    def build(cls, values, health, labels, max_top_n=10, chunk_bytes=32 << 20):
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        health = np.ascontiguousarray(health, dtype=np.float64)
+        labels = np.asarray(labels)
+        n = len(values)
+
+        order = np.lexsort((np.arange(n), -health))
+        sorted_values = values[order]
+        table = np.full((n, max_top_n), -1, dtype=np.int64)
+
+        # Per query row: the bool mask, its int32 running count and the keep mask.
+        chunk = max(1, chunk_bytes // (6 * max(n, 1)))
+        for start in range(0, n, chunk):
+            mask = dominance_mask(sorted_values, values[start:start + chunk])
+            counts = np.cumsum(mask, axis=1, dtype=np.int32)
+            rows, cols = np.nonzero(mask & (counts <= max_top_n))
+            slots = counts[rows, cols] - 1
+            table[start + rows, slots] = order[cols]
+
+        return cls(values, health, labels, table, _content_key(values, health, max_top_n))
+
+    @classmethod
+    def from_frames(cls, df_original, df_scored, max_top_n=10):
+        values = df_original[DOMINANCE_COLUMNS].to_numpy(dtype=np.float64)
+        health = df_scored['Health_Score'].reindex(df_original.index).to_numpy(dtype=np.float64)
+        return cls.build(values, health, df_original.index.to_numpy(), max_top_n)
+
+    def _resort(self):
+        self.order = np.lexsort((np.arange(len(self.health)), -self.health))
+        self.sorted_values = self.values[self.order]
+
+    def _recompute_rows(self, rows, chunk_bytes=32 << 20):
+        rows = np.asarray(sorted(set(rows)), dtype=np.int64)
+        if len(rows) == 0:
+            return
+        n = len(self.values)
+        chunk = max(1, chunk_bytes // (6 * max(n, 1)))
+        for start in range(0, len(rows), chunk):
+            batch = rows[start:start + chunk]
+            mask = dominance_mask(self.sorted_values, self.values[batch])
+            counts = np.cumsum(mask, axis=1, dtype=np.int32)
+            r, cols = np.nonzero(mask & (counts <= self.max_top_n))
+            self.table[batch] = -1
+            self.table[batch[r], counts[r, cols] - 1] = self.order[cols]
+
+    def _dominated_by(self, point):
+        return np.flatnonzero(dominance_mask(point[None, :], self.values)[:, 0])
+
+    def _referencing(self, pos):
+        return np.flatnonzero((self.table == pos).any(axis=1))
+
+    # Row-level patches. Deleted rows are tombstoned (NaN values, -inf score) so
+    # positions stay stable; only rows whose stored lists can change are redone.
+
+    def insert(self, label, point, health):
+        point = np.asarray(point, dtype=np.float64)
+        pos = len(self.values)
+        self.values = np.vstack([self.values, point[None, :]])
+        self.health = np.append(self.health, float(health))
+        self.labels = np.append(self.labels, label)
+        self.table = np.vstack([self.table, np.full((1, self.max_top_n), -1, dtype=self.table.dtype)])
+        self.positions[label] = pos
+        self._resort()
+        self._recompute_rows(np.append(self._dominated_by(point), pos))
+        self.key = None
+        return pos
+
+    def delete(self, label):
+        pos = self.positions.pop(label)
+        affected = self._referencing(pos)
+        self.values[pos] = np.nan
+        self.health[pos] = -np.inf
+        self.table[pos] = -1
+        self._resort()
+        self._recompute_rows(affected)
+        self.key = None
+
+    def update(self, label, point, health):
+        pos = self.positions[label]
+        point = np.asarray(point, dtype=np.float64)
+        affected = np.concatenate([self._referencing(pos), self._dominated_by(point), [pos]])
+        self.values[pos] = point
+        self.health[pos] = float(health)
+        self._resort()
+        self._recompute_rows(affected)
+        self.key = None
+
+    def save(self, path):
+        if self.key is None:
+            self.key = _content_key(self.values, self.health, self.max_top_n)
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, values=self.values, health=self.health, labels=self.labels,
+                 table=self.table, key=np.array(self.key))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['values'], data['health'], data['labels'], data['table'], str(data['key']))
+
+    @classmethod
+    def load_or_build(cls, path, df_original, df_scored, max_top_n=10):
+        values = df_original[DOMINANCE_COLUMNS].to_numpy(dtype=np.float64)
+        health = df_scored['Health_Score'].reindex(df_original.index).to_numpy(dtype=np.float64)
+        key = _content_key(values, health, max_top_n)
+        if path is not None and os.path.exists(path):
+            try:
+                index = cls.load(path)
+                if index.key == key:
+                    return index
+            except (OSError, ValueError, KeyError):
+                pass
+        index = cls.build(values, health, df_original.index.to_numpy(), max_top_n)
+        if path is not None:
+            try:
+                index.save(path)
+            except OSError:
+                pass
+        return index
+
+    def _scan(self, point, top_n, block=4096):
+        found = []
+        point = np.asarray(point, dtype=np.float64)[None, :]
+        for start in range(0, len(self.sorted_values), block):
+            mask = dominance_mask(self.sorted_values[start:start + block], point)[0]
+            found.extend(self.order[start + np.flatnonzero(mask)].tolist())
+            if len(found) >= top_n:
+                break
+        return found[:top_n]
+
+    def query_positions(self, pos, top_n=3):
+        if top_n < 1:
+            raise ValueError(f"top_n must be at least 1, got {top_n}.")
+        if top_n <= self.max_top_n:
+            row = self.table[pos, :top_n]
+            return row[row >= 0].tolist()
+        return self._scan(self.values[pos], top_n)
+
+    def query_point(self, point, top_n=3):
+        if top_n < 1:
+            raise ValueError(f"top_n must be at least 1, got {top_n}.")
+        return self.labels[self._scan(point, top_n)]
+
+    def alternatives(self, label, top_n=3):
+        return self.labels[self.query_positions(self.positions[label], top_n)]
@@ -1,10 +1,23 @@
 # gui.py
+import os
+import queue
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import ttk, messagebox
-from data_loader import load_and_process_data
-from health_score import compute_health_score, get_healthier_alternatives
+from data_loader import load_menu, cache_path, dataset_version, DEFAULT_CACHE_DIR
+from health_score import ScoringEngine, score_frame, get_healthier_alternatives
 from caloric_needs import calculate_bmr, calculate_tdee
-import pandas as pd
+from name_index import NameIndex
+from dominance_index import DominanceIndex
+from meal_planner import prepare_chain_menu, plan_day, format_plan
+from result_cache import ResultCache, alternatives_key, plan_key, tdee_bucket
+from instrumentation import stage, configure_from_env, clear_sinks
+
+DATA_PATH = "FastFoodNutritionMenuV2.csv"
+POLL_MS = 30
+TYPEAHEAD_DELAY_MS = 150
+TYPEAHEAD_LIMIT = 8
+RESULT_KEYS = ['calories', 'total_fat', 'protein']
 
 class NutritionApp:
     def __init__(self, root):
@@ -14,10 +27,65 @@ class NutritionApp:
         self.root.resizable(False, False)
 
         self.include_drink = tk.BooleanVar(value=False)
-        self.df, self.features = load_and_process_data("FastFoodNutritionMenuV2.csv")
-        self.df_scored = compute_health_score(self.df.copy(), self.features)
+        self.plan_mode = tk.StringVar(value="knapsack")
+        self.menus = {}
+        self.loaded = False
+        self.request_id = 0
+        self.typeahead_job = None
+
+        # One worker thread: the dataset load runs first and every search or plan
+        # queues behind it, so the data is never touched concurrently. Results
+        # come back through a queue that the Tk thread polls with root.after.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nutrition-worker")
+        self.done = queue.Queue()
 
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        self.status.config(text="Loading menu data…")
+        self.submit(self.load_data, self.on_loaded)
+        self.root.after(POLL_MS, self.poll)
+
+    def load_data(self):
+        self.menu = load_menu(DATA_PATH, DEFAULT_CACHE_DIR)
+        self.df, self.features = self.menu.frame, self.menu.schema.features
+        self.scoring = ScoringEngine(self.df)
+        self.df_scored = score_frame(self.df, engine=self.scoring)
+        self.name_index = NameIndex.from_frame(self.df)
+        self.dominance_index = DominanceIndex.load_or_build(
+            os.path.join(cache_path(DATA_PATH, DEFAULT_CACHE_DIR), "dominance.npz"), self.df, self.df_scored)
+        self.results = ResultCache(dataset_version(DATA_PATH, DEFAULT_CACHE_DIR), maxsize=512)
+        self.chains = self.menu.chains.tolist()
+        return len(self.df)
+
+    def on_loaded(self, rows, error):
+        if error is not None:
+            self.status.config(text="Could not load menu data.")
+            messagebox.showerror("Load Error", f"Could not load {DATA_PATH}: {error}")
+            return
+        self.loaded = True
+        self.status.config(text=f"Ready – {rows} menu items.")
+        self.update_suggestions()
+
+    def submit(self, fn, callback, *args):
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda f: self.done.put((f, callback)))
+        return future
+
+    def poll(self):
+        while True:
+            try:
+                future, callback = self.done.get_nowait()
+            except queue.Empty:
+                break
+            if future.cancelled():
+                continue
+            error = future.exception()
+            callback(None if error else future.result(), error)
+        self.root.after(POLL_MS, self.poll)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
 
     def setup_ui(self):
         header_frame = ttk.Frame(self.root)
@@ -37,6 +105,10 @@ class NutritionApp:
 
         self.entry = ttk.Entry(input_frame, width=40)
         self.entry.grid(row=0, column=1, padx=5)
+        self.entry.bind("<KeyRelease>", self.schedule_typeahead)
+        self.entry.bind("<Return>", lambda event: self.search())
+        self.entry.bind("<Down>", self.focus_suggestions)
+        self.entry.bind("<Escape>", lambda event: self.hide_suggestions())
 
         self.search_button = ttk.Button(input_frame, text="🔍 Search Alternatives", command=self.search)
         self.search_button.grid(row=0, column=2, padx=5)
@@ -50,38 +122,140 @@ class NutritionApp:
         self.drink_checkbox = ttk.Checkbutton(input_frame, text="Include 0-Calorie Drink", variable=self.include_drink)
         self.drink_checkbox.grid(row=3, column=1, pady=5)
 
+        self.plan_mode_menu = ttk.Combobox(input_frame, textvariable=self.plan_mode, values=["knapsack", "greedy"], state='readonly')
+        self.plan_mode_menu.grid(row=2, column=2, padx=5)
+
         self.result_text = tk.Text(self.root, height=20, width=100)
         self.result_text.pack(pady=10)
 
+        self.status = ttk.Label(self.root, text="", anchor='w')
+        self.status.pack(fill='x', padx=10)
+
+        # Type-ahead list overlaid just below the entry, shown only while it has matches.
+        self.suggestions = tk.Listbox(self.root, height=TYPEAHEAD_LIMIT, activestyle='dotbox')
+        self.suggestions.bind("<ButtonRelease-1>", self.pick_suggestion)
+        self.suggestions.bind("<Return>", self.pick_suggestion)
+        self.suggestions.bind("<Escape>", lambda event: (self.hide_suggestions(), self.entry.focus_set()))
+
+    def schedule_typeahead(self, event):
+        if event.keysym in ("Return", "Down", "Up", "Escape"):
+            return
+        if self.typeahead_job is not None:
+            self.root.after_cancel(self.typeahead_job)
+        self.typeahead_job = self.root.after(TYPEAHEAD_DELAY_MS, self.update_suggestions)
+
+    def suggest(self, text, limit=TYPEAHEAD_LIMIT):
+        # Prefix matches first, then word/substring matches, one entry per item name.
+        names = []
+        for label in list(self.name_index.prefix(text, limit * 4)) + list(self.name_index.search(text, limit * 4)):
+            name = self.menu.items[self.menu.positions[label]]
+            if name not in names:
+                names.append(name)
+            if len(names) == limit:
+                break
+        return names
+
+    def update_suggestions(self):
+        self.typeahead_job = None
+        text = self.entry.get().strip()
+        if not self.loaded or len(text) < 2:
+            self.hide_suggestions()
+            return
+        # Both lookups are index hits, cheap enough to stay on the Tk thread.
+        names = self.suggest(text)
+        if not names:
+            self.hide_suggestions()
+            return
+        self.suggestions.delete(0, tk.END)
+        for name in names:
+            self.suggestions.insert(tk.END, name)
+        self.suggestions.config(height=len(names))
+        self.suggestions.place(in_=self.entry, x=0, rely=1.0, relwidth=1.0)
+        self.suggestions.lift()
+
+    def hide_suggestions(self):
+        self.suggestions.place_forget()
+
+    def focus_suggestions(self, event):
+        if self.suggestions.winfo_ismapped():
+            self.suggestions.focus_set()
+            self.suggestions.selection_clear(0, tk.END)
+            self.suggestions.selection_set(0)
+            self.suggestions.activate(0)
+        return "break"
+
+    def pick_suggestion(self, event):
+        selection = self.suggestions.curselection()
+        if not selection:
+            return
+        self.entry.delete(0, tk.END)
+        self.entry.insert(0, self.suggestions.get(selection[0]))
+        self.hide_suggestions()
+        self.entry.focus_set()
+        self.search()
+
     def search(self):
         item_name = self.entry.get().strip()
-        self.result_text.delete("1.0", tk.END)
+        self.hide_suggestions()
 
         if not item_name:
             messagebox.showwarning("Input Error", "Please enter a menu item to search.")
             return
 
-        original, alternatives = get_healthier_alternatives(item_name, self.df, self.df_scored)
-        if isinstance(original, str):
-            self.result_text.insert(tk.END, original)
-        else:
-            if original is None or not isinstance(original, pd.DataFrame):
-                self.result_text.insert(tk.END, "Could not find the original item in the dataset.")
-            return
+        self.start_request("Searching…", 'alternatives', self.find_alternatives, item_name)
 
-        cal_col = next((col for col in original.columns if 'calories' in col.lower()), 'Calories')
-        fat_col = next((col for col in original.columns if 'fat' in col.lower()), 'Total_Fat')
-        protein_col = next((col for col in original.columns if 'protein' in col.lower()), 'Protein')
+    def start_request(self, status, view, fn, *args):
+        # Only the newest request may write to the result area; older ones finish quietly.
+        self.request_id += 1
+        request_id = self.request_id
+        self.status.config(text=status if self.loaded else "Loading menu data…")
+        self.submit(fn, lambda text, error: self.show_result(request_id, view, text, error), *args)
 
-        cols = [col for col in ['Item', cal_col, fat_col, protein_col] if col in original.columns]
-        self.result_text.insert(tk.END, f"Original Item:{original[cols].to_string(index=False)}")
+    def show_result(self, request_id, view, text, error):
+        if request_id != self.request_id:
+            return
+        if error is not None:
+            self.status.config(text="Request failed.")
+            messagebox.showerror("Error", f"{error}")
+            return
+        with stage('gui.render', view=view):
+            self.result_text.delete("1.0", tk.END)
+            self.result_text.insert(tk.END, text)
+        self.status.config(text="Ready.")
+
+    def find_alternatives(self, item_name):
+        # Runs on the worker thread; returns the text to show.
+        original, alternatives = self.results.get_or_compute(
+            alternatives_key(item_name),
+            lambda: get_healthier_alternatives(item_name, self.df, self.df_scored, name_index=self.name_index,
+                                               dominance_index=self.dominance_index))
+        if original is None or not hasattr(original, 'columns'):
+            return alternatives if isinstance(alternatives, str) else "Could not find the original item in the dataset."
+
+        rows = self.menu.rows(original.index)
+        text = f"Original Item:\n{self.format_rows(rows)}\n"
         if alternatives is not None:
-            self.result_text.insert(tk.END, "Healthier Alternatives:\n")
-            self.result_text.insert(tk.END, f"{alternatives[['Item', 'Calories', 'Total_Fat_(g)', 'Protein_(g)']].to_string(index=False)}")
+            text += f"\nHealthier Alternatives:\n{self.format_rows(self.menu.rows(alternatives.index))}"
         else:
-            self.result_text.insert(tk.END, "No healthier alternatives found.")
+            text += "\nNo healthier alternatives found."
+        return text
+
+    def format_rows(self, rows):
+        # Raw-unit values read by schema position from the feature block.
+        cols = self.menu.schema.index(*RESULT_KEYS)
+        values = self.menu.raw[rows][:, cols]
+        width = max([4] + [len(self.menu.items[pos]) for pos in rows])
+        titles = [f"{key.replace('_', ' ').title()} ({self.menu.unit(key)})" for key in RESULT_KEYS]
+        lines = [f"{'Item':<{width}}" + "".join(f"{title:>16}" for title in titles)]
+        for pos, row in zip(rows, values):
+            lines.append(f"{self.menu.items[pos]:<{width}}" + "".join(f"{value:>16.0f}" for value in row))
+        return "\n".join(lines)
 
     def open_calorie_calc(self):
+        if not self.loaded:
+            messagebox.showinfo("Please Wait", "Menu data is still loading.")
+            return
+
         top = tk.Toplevel(self.root)
         top.title("Caloric Needs Calculator")
         top.geometry("400x400")
@@ -108,8 +282,7 @@ class NutritionApp:
                 ttk.Entry(top, textvariable=values[i], width=25).grid(row=i, column=1, pady=5)
 
         ttk.Label(top, text="Preferred Fast Food Chain:").grid(row=6, column=0, sticky='w', padx=10, pady=5)
-        chains = sorted(self.df['Company'].unique())
-        chain_menu = ttk.Combobox(top, textvariable=self.chain_var, values=chains, state='readonly')
+        chain_menu = ttk.Combobox(top, textvariable=self.chain_var, values=self.chains, state='readonly')
         chain_menu.grid(row=6, column=1, pady=5)
         chain_menu.current(0)
 
@@ -146,76 +319,24 @@ class NutritionApp:
             messagebox.showwarning("Missing Info", "Please calculate TDEE first using the Caloric Needs Calculator.")
             return
 
-        def find_col(name_hint):
-            for col in self.df.columns:
-                cl = col.lower()
-                if name_hint in cl and 'dv' not in cl and '%' not in cl:
-                    return col
-            return None
-
-        cal_col = find_col("calories")
-        protein_col = find_col("protein")
-        fat_col = find_col("fat")
-        carb_col = find_col("carb")
-        fiber_col = find_col("fiber")
-        sugar_col = find_col("sugar")
-
-        df_chain = self.df[self.df['Company'].str.lower() == chain.lower()].copy()
-
-        for col in [cal_col, protein_col, fat_col, carb_col, fiber_col, sugar_col]:
-            df_chain[col] = pd.to_numeric(df_chain[col], errors='coerce')
-        for col in [cal_col, protein_col, fat_col, carb_col, fiber_col, sugar_col]:
-            df_chain[col] = pd.to_numeric(df_chain[col], errors='coerce').abs()
-        df_chain.dropna(subset=[cal_col, protein_col, fat_col, carb_col, fiber_col, sugar_col], inplace=True)
-
-        # Filter out unrealistic or junk values
-        df_chain = df_chain[
-            (df_chain[cal_col] > 100) &
-            (df_chain[protein_col] > 10) &
-            (df_chain[fat_col] < 80)
-        ]
-
-        df_chain['HealthScore'] = (
-            df_chain[protein_col] * 2 -
-            df_chain[fat_col] * 1 -
-            df_chain[sugar_col] * 1 +
-            df_chain[fiber_col] * 1
-        )
-
-        df_chain = df_chain[~df_chain['Item'].str.lower().str.contains("drink|soda|coffee|juice|milk|packet|syrup|sauce")]
-        df_chain.sort_values(by='HealthScore', ascending=False, inplace=True)
-
-        meal_targets = [0.3 * tdee, 0.35 * tdee, 0.35 * tdee]
-        meals = [[], [], []]
-        totals = [(0, 0, 0) for _ in range(3)]
-        used = set()
-
-        for meal_idx in range(3):
-            cal_limit = meal_targets[meal_idx]
-            total_cals, total_prot, total_fat, total_carb = 0, 0, 0, 0
-            for _, row in df_chain.iterrows():
-                if row['Item'] in used:
-                    continue
-                if total_cals + row[cal_col] > cal_limit:
-                    continue
-                meals[meal_idx].append(row)
-                used.add(row['Item'])
-                total_cals += row[cal_col]
-                total_prot += row[protein_col]
-                total_fat += row[fat_col]
-                total_carb += row[carb_col]
-            totals[meal_idx] = (total_prot, total_fat, total_carb)
-
-        self.result_text.delete("1.0", tk.END)
-        for i, meal in enumerate(meals):
-            self.result_text.insert(tk.END, f"\nMeal {i+1} Suggestions:\n")
-            for item in meal:
-                self.result_text.insert(tk.END, f"{item['Item']} – {item[cal_col]:.0f} cal\n")
-                self.result_text.insert(tk.END, f"Protein: {item[protein_col]:.1f}g | Fat: {item[fat_col]:.1f}g | Carbs: {item[carb_col]:.1f}g\n")
-            prot, fat, carb = totals[i]
-            self.result_text.insert(tk.END, f"→ Meal Total: Protein: {prot:.1f}g | Fat: {fat:.1f}g | Carbs: {carb:.1f}g\n")
+        self.start_request("Planning meals…", 'plan', self.build_plan, chain, tdee, self.plan_mode.get())
+
+    def build_plan(self, chain, tdee, mode):
+        # Runs on the worker thread; returns the text to show.
+        if chain not in self.menus:
+            self.menus[chain] = prepare_chain_menu(self.menu, chain)
+        menu = self.menus[chain]
+        meals = self.results.get_or_compute(plan_key(chain, tdee, mode), lambda: plan_day(menu, tdee_bucket(tdee), mode))
+        return format_plan(menu, meals)
 
 if __name__ == "__main__":
+    # NUTRITION_METRICS=log|jsonl:<path>|prom:<path>, NUTRITION_PROFILE=<path.prof>
+    profiling = configure_from_env()
     root = tk.Tk()
     app = NutritionApp(root)
-    root.mainloop()
+    try:
+        root.mainloop()
+    finally:
+        if profiling is not None:
+            profiling.__exit__(None, None, None)
+        clear_sinks()
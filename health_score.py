@@ -1,32 +1,264 @@
 import numpy as np
 
-def compute_health_score(df, features):
-    health_weights = {
+from instrumentation import stage
+from schema import NUTRIENTS
+
+SCORING_PROFILES = {
+    'default': {
         'Calories': -1, 'Total_Fat(g)': -1, 'Saturated_Fat(g)': -1, 'Trans_Fat(g)': -1,
         'Cholesterol(mg)': -1, 'Sodium_(mg)': -1, 'Fiber(g)': 1, 'Protein(g)': 1
-    }
+    },
+    'high_protein': {
+        'Calories': -1, 'Total_Fat(g)': -1, 'Saturated_Fat(g)': -1, 'Trans_Fat(g)': -1,
+        'Sodium_(mg)': -1, 'Sugars(g)': -1, 'Fiber(g)': 1, 'Protein(g)': 3
+    },
+    'low_sodium': {
+        'Calories': -1, 'Total_Fat(g)': -1, 'Saturated_Fat(g)': -1, 'Trans_Fat(g)': -1,
+        'Cholesterol(mg)': -1, 'Sodium_(mg)': -3, 'Fiber(g)': 1, 'Protein(g)': 1
+    },
+    'meal_plan': {'Protein(g)': 2, 'Total_Fat(g)': -1, 'Sugars(g)': -1, 'Fiber(g)': 1},
+}
+
+def weights_matrix(columns, profiles):
+    # (len(columns), len(profiles)); weights for columns a profile does not mention are 0
+    matrix = np.zeros((len(columns), len(profiles)))
+    for j, weights in enumerate(profiles):
+        for i, col in enumerate(columns):
+            matrix[i, j] = weights.get(col, 0)
+    return matrix
+
+def _score_columns(df, profiles):
+    return [col for col in dict.fromkeys(c for weights in profiles for c in weights) if col in df.columns]
+
+class ScoringEngine:
+    # Scores a fixed feature block under any number of named weight profiles.
+    # Missing profiles are computed together in one features @ weights product
+    # and cached as float32 vectors, so serving another profile costs one matmul
+    # over the rows rather than another pass (and copy) of the frame.
+
+    def __init__(self, df, profiles=None, dtype=np.float32):
+        self.index = df.index
+        self.profiles = dict(SCORING_PROFILES if profiles is None else profiles)
+        self.columns = _score_columns(df, self.profiles.values())
+        self.dtype = dtype
+        self.features_matrix = df[self.columns].to_numpy(dtype=dtype)
+        self._cache = {}
+
+    def register(self, name, weights):
+        unknown = set(weights) - set(self.columns)
+        if unknown:
+            raise KeyError(f"Profile '{name}' uses columns not in the feature block: {sorted(unknown)}")
+        self.profiles[name] = dict(weights)
+        self._cache.pop(name, None)
+
+    def scores(self, names=None):
+        names = list(self.profiles) if names is None else list(names)
+        missing = [name for name in names if name not in self._cache]
+        if missing:
+            weights = weights_matrix(self.columns, [self.profiles[name] for name in missing])
+            block = self.features_matrix @ weights.astype(self.dtype)
+            for j, name in enumerate(missing):
+                self._cache[name] = np.ascontiguousarray(block[:, j])
+        return np.column_stack([self._cache[name] for name in names])
+
+    def score(self, name='default'):
+        if name not in self._cache:
+            self.scores([name])
+        return self._cache[name]
+
+    def frame(self, names=None):
+        import pandas as pd
+
+        names = list(self.profiles) if names is None else list(names)
+        return pd.DataFrame(self.scores(names), index=self.index, columns=names)
+
+def score_frame(df, profile='default', engine=None):
+    # Health_Score alone, aligned to df.index, without copying the menu frame.
+    # With the engine built over df at load, the column is its cached vector.
+    import pandas as pd
+
+    if engine is None:
+        engine = ScoringEngine(df, {profile: SCORING_PROFILES[profile]})
+    return pd.DataFrame({'Health_Score': engine.score(profile)}, index=engine.index)
 
-    df['Health_Score'] = np.zeros(len(df))
-    for feature, weight in health_weights.items():
-        if feature in df.columns:
-            df['Health_Score'] += df[feature] * weight
+def compute_health_score(df, features, profile='default'):
+    with stage('score', rows=len(df), profile=profile):
+        df['Health_Score'] = score_frame(df, profile)['Health_Score']
     return df
 
-def get_healthier_alternatives(item_name, df_original, df_scored, top_n=3):
-    item_data = df_original[df_original['Item'].str.contains(item_name, case=False, na=False)]
-    if item_data.empty:
+def find_item(item_name, df_original, name_index=None):
+    with stage('alternatives.name_lookup', indexed=name_index is not None) as s:
+        if name_index is not None:
+            label = name_index.first(item_name)
+            s['found'] = int(label is not None)
+            return None if label is None else df_original.loc[label]
+        item_data = df_original[df_original['Item'].str.contains(item_name, case=False, na=False)]
+        s['matches'] = len(item_data)
+    return None if item_data.empty else item_data.iloc[0]
+
+def get_healthier_alternatives(item_name, df_original, df_scored, top_n=3, name_index=None,
+                               dominance_index=None):
+    item_data = find_item(item_name, df_original, name_index)
+    if item_data is None:
         return None, f"Item '{item_name}' not found."
 
-    item_data = item_data.iloc[0]
-    candidates = df_original[
-        (df_original['Calories'] <= item_data['Calories']) &
-        (df_original['Total_Fat(g)'] < item_data['Total_Fat(g)']) &
-        (df_original['Sugars(g)'] < item_data['Sugars(g)']) &
-        (df_original['Fiber(g)'] >= item_data['Fiber(g)']) &
-        (df_original['Protein(g)'] > item_data['Protein(g)'])
-    ]
+    if dominance_index is not None:
+        with stage('alternatives.dominance', indexed=True) as s:
+            top_indices = dominance_index.alternatives(item_data.name, top_n)
+            s['results'] = len(top_indices)
+        if len(top_indices) == 0:
+            return item_data.to_frame().T, None
+        return item_data.to_frame().T, df_original.loc[top_indices]
+
+    with stage('alternatives.dominance', indexed=False, rows=len(df_original)) as s:
+        candidates = df_original[
+            (df_original['Calories'] <= item_data['Calories']) &
+            (df_original['Total_Fat(g)'] < item_data['Total_Fat(g)']) &
+            (df_original['Sugars(g)'] < item_data['Sugars(g)']) &
+            (df_original['Fiber(g)'] >= item_data['Fiber(g)']) &
+            (df_original['Protein(g)'] > item_data['Protein(g)'])
+        ]
+        s['candidates'] = len(candidates)
     if candidates.empty:
         return item_data.to_frame().T, None
 
-    top_indices = df_scored.loc[candidates.index].sort_values(by='Health_Score').head(top_n).index
+    with stage('alternatives.rank', candidates=len(candidates)):
+        top_indices = df_scored.loc[candidates.index].sort_values(
+            by='Health_Score', ascending=False, kind='stable').head(top_n).index
     return item_data.to_frame().T, df_original.loc[top_indices]
+
+DOMINANCE_KEYS = ['calories', 'total_fat', 'sugars', 'fiber', 'protein']
+DOMINANCE_COLUMNS = [NUTRIENTS[key] for key in DOMINANCE_KEYS]
+
+def dominance_mask(values, query):
+    # values: (n, 5) block in DOMINANCE_COLUMNS order, query: (m, 5) -> (m, n) mask
+    return (
+        (values[None, :, 0] <= query[:, None, 0]) &
+        (values[None, :, 1] < query[:, None, 1]) &
+        (values[None, :, 2] < query[:, None, 2]) &
+        (values[None, :, 3] >= query[:, None, 3]) &
+        (values[None, :, 4] > query[:, None, 4])
+    )
+
+def _top_n_rows(scores, top_n):
+    # Highest-score columns per row, ties by position, matching the single-item path.
+    # Every column scoring at least the row's k-th best is kept before ranking,
+    # so ties at the cut are broken by position too. Short rows are -inf padded.
+    m, n = scores.shape
+    k = min(top_n, n)
+    if k <= 0:
+        return np.zeros((m, 0), dtype=np.int64), np.zeros((m, 0))
+    kth = np.partition(scores, n - k, axis=1)[:, n - k]
+    rows, cols = np.nonzero((scores >= kth[:, None]) & (scores > -np.inf))
+    picked = scores[rows, cols]
+    order = np.lexsort((cols, -picked, rows))
+    rows, cols, picked = rows[order], cols[order], picked[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = rank < k
+    top = np.zeros((m, k), dtype=np.int64)
+    top_scores = np.full((m, k), -np.inf)
+    top[rows[keep], rank[keep]] = cols[keep]
+    top_scores[rows[keep], rank[keep]] = picked[keep]
+    return top, top_scores
+
+def get_healthier_alternatives_batch(items, df_original, df_scored, top_n=3, name_index=None,
+                                     chunk_bytes=64 << 20):
+    # One row per (query, alternative) in query order. A query that matches no
+    # item, or has nothing healthier, gets a single row with null item columns
+    # and a 'reason' ("not found" / "no healthier alternative") instead.
+    import pandas as pd
+
+    values = df_original[DOMINANCE_COLUMNS].to_numpy(dtype=np.float64)
+    health = df_scored['Health_Score'].reindex(df_original.index).to_numpy(dtype=np.float64)
+    n = len(values)
+
+    sources = []
+    for item_name in items:
+        item_data = find_item(item_name, df_original, name_index)
+        sources.append(None if item_data is None else df_original.index.get_loc(item_data.name))
+    matched = [i for i, src in enumerate(sources) if src is not None]
+
+    found = {}
+    # Peak per (query, row) cell while ranking: the float64 score matrix, the
+    # float64 copy np.partition makes of it and two bool temporaries (18 bytes).
+    chunk = max(1, chunk_bytes // (18 * max(n, 1)))
+    for start in range(0, len(matched), chunk):
+        queries = matched[start:start + chunk]
+        src = np.asarray([sources[i] for i in queries])
+        mask = dominance_mask(values, values[src])
+        scores = np.where(mask, health[None, :], -np.inf)
+        del mask
+        top, top_scores = _top_n_rows(scores, top_n)
+        for i, pos, score in zip(queries, top, top_scores):
+            found[i] = pos[np.isfinite(score)].tolist()
+
+    out_query, out_source, out_rank, out_pos = [], [], [], []
+    miss_query, miss_source, miss_reason, miss_order = [], [], [], []
+    hit_order = []
+    for i, item_name in enumerate(items):
+        pos = found.get(i, [])
+        if pos:
+            out_query.extend([item_name] * len(pos))
+            out_source.extend([df_original.index[sources[i]]] * len(pos))
+            out_rank.extend(range(1, len(pos) + 1))
+            out_pos.extend(pos)
+            hit_order.extend([i] * len(pos))
+        else:
+            miss_query.append(item_name)
+            miss_source.append(None if sources[i] is None else df_original.index[sources[i]])
+            miss_reason.append("not found" if sources[i] is None else "no healthier alternative")
+            miss_order.append(i)
+
+    result = df_original.iloc[out_pos].copy()
+    result.insert(0, 'rank', pd.array(out_rank, dtype='Int64'))
+    result.insert(0, 'source_index', out_source)
+    result.insert(0, 'query', out_query)
+    result['Health_Score'] = health[out_pos]
+    result['reason'] = None
+    if miss_query:
+        # Object index and source_index so the null labels don't turn the rest into floats.
+        labels = result.index.astype(object).tolist() + [None] * len(miss_query)
+        result['source_index'] = result['source_index'].astype(object)
+        misses = pd.DataFrame({'query': miss_query, 'source_index': pd.Series(miss_source, dtype=object),
+                               'rank': pd.array([None] * len(miss_query), dtype='Int64'),
+                               'reason': miss_reason})
+        result = pd.concat([result.reset_index(drop=True), misses.reindex(columns=result.columns)],
+                           ignore_index=True)
+        result.index = pd.Index(labels, dtype=object)
+        result = result.iloc[np.argsort(hit_order + miss_order, kind='stable')]
+    return result
+
+def score_chunks(streamed, profile='default', out_path=None):
+    # Health_Score over a StreamedMenu one chunk at a time, optionally into a .npy memmap.
+    weights = SCORING_PROFILES[profile]
+    columns = [col for col in weights if col in streamed.features]
+    w = weights_matrix(columns, [weights])[:, 0]
+    idx = [streamed.features.index(col) for col in columns]
+    if out_path is None:
+        health = np.empty(len(streamed))
+    else:
+        health = np.lib.format.open_memmap(out_path, mode='w+', dtype=np.float64, shape=(len(streamed),))
+    for start, _, scaled in streamed.iter_chunks():
+        health[start:start + len(scaled)] = np.asarray(scaled)[:, idx] @ w
+    return health
+
+def find_item_chunked(item_name, streamed):
+    needle = item_name.lower()
+    for start, raw, _ in streamed.iter_chunks():
+        names = np.char.lower(streamed.strings('Item', start, start + len(raw)))
+        hits = np.flatnonzero(np.char.find(names, needle) >= 0)
+        if len(hits):
+            return start + int(hits[0])
+    return None
+
+def get_healthier_alternatives_chunked(pos, streamed, health, top_n=3):
+    # Index labels of the top_n dominating rows for row `pos`, merged chunk by chunk.
+    dom = [streamed.features.index(col) for col in DOMINANCE_COLUMNS]
+    point = np.asarray(streamed.raw[pos, dom])[None, :]
+    best = np.empty(0, dtype=np.int64)
+    for start, raw, _ in streamed.iter_chunks():
+        mask = dominance_mask(np.asarray(raw)[:, dom], point)[0]
+        cand = np.concatenate([best, start + np.flatnonzero(mask)])
+        order = np.lexsort((cand, -health[cand]))
+        best = cand[order[:top_n]]
+    return np.asarray(streamed.index[best])
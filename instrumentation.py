@@ -0,0 +1,242 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+# Heavier stdlib modules (logging, cProfile, pstats) are imported on first use
+# so instrumented modules keep their import time.
+_sinks = []
+
+
+class _NullStage:
+    # Shared no-op returned while no sink is installed, so an instrumented call
+    # costs one function call and a list truth test.
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setitem__(self, key, value):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage(dict):
+
+    def __init__(self, name, fields):
+        super().__init__(fields)
+        self.name = name
+
+    def __enter__(self):
+        self.memory_start = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event = {'stage': self.name, 'seconds': time.perf_counter() - self.start, 'ts': time.time()}
+        if self.memory_start is not None:
+            event['memory_delta'] = tracemalloc.get_traced_memory()[0] - self.memory_start
+        if exc_type is not None:
+            event['error'] = exc_type.__name__
+        event.update(self)
+        for sink in list(_sinks):
+            sink.emit(event)
+        return False
+
+
+def stage(name, **fields):
+    # with stage('alternatives.filter', rows=n) as s: ...; s['candidates'] = k
+    if not _sinks:
+        return _NULL_STAGE
+    return _Stage(name, fields)
+
+
+def enabled():
+    return bool(_sinks)
+
+
+def add_sink(sink):
+    _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    _sinks.remove(sink)
+    sink.close()
+
+
+def clear_sinks():
+    while _sinks:
+        remove_sink(_sinks[-1])
+
+
+class LoggingSink:
+
+    def __init__(self, logger='nutrition.stages', level=None):
+        import logging
+
+        self.logger = logging.getLogger(logger) if isinstance(logger, str) else logger
+        self.level = logging.INFO if level is None else level
+
+    def emit(self, event):
+        extra = ' '.join(f"{k}={v}" for k, v in event.items() if k not in ('stage', 'seconds', 'ts'))
+        self.logger.log(self.level, "%s %.3f ms %s", event['stage'], event['seconds'] * 1000, extra)
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink:
+
+    def __init__(self, path):
+        self.file = open(path, 'a', buffering=1)
+        self.lock = threading.Lock()
+
+    def emit(self, event):
+        line = json.dumps(event, default=str)
+        with self.lock:
+            self.file.write(line + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class PrometheusSink:
+    # Per-stage count/sum/max (plus summed numeric fields) rewritten atomically
+    # to a text file, for node_exporter's textfile collector. At most one write
+    # per `interval` seconds; close() writes the final state.
+
+    def __init__(self, path, prefix='nutrition', interval=1.0):
+        self.path = path
+        self.prefix = prefix
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.counts = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self.max_seconds = defaultdict(float)
+        self.totals = defaultdict(float)
+        self.last_write = 0.0
+
+    def emit(self, event):
+        name = event['stage']
+        with self.lock:
+            self.counts[name] += 1
+            self.seconds[name] += event['seconds']
+            self.max_seconds[name] = max(self.max_seconds[name], event['seconds'])
+            for key, value in event.items():
+                if key not in ('seconds', 'ts') and isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self.totals[name, key] += value
+            if time.monotonic() - self.last_write >= self.interval:
+                self._write()
+
+    def _write(self):
+        p = self.prefix
+        lines = [f"# TYPE {p}_stage_calls_total counter",
+                 *(f'{p}_stage_calls_total{{stage="{s}"}} {c}' for s, c in sorted(self.counts.items())),
+                 f"# TYPE {p}_stage_seconds_total counter",
+                 *(f'{p}_stage_seconds_total{{stage="{s}"}} {v:.9f}' for s, v in sorted(self.seconds.items())),
+                 f"# TYPE {p}_stage_seconds_max gauge",
+                 *(f'{p}_stage_seconds_max{{stage="{s}"}} {v:.9f}' for s, v in sorted(self.max_seconds.items())),
+                 f"# TYPE {p}_stage_field_total counter",
+                 *(f'{p}_stage_field_total{{stage="{s}",field="{k}"}} {v:g}'
+                   for (s, k), v in sorted(self.totals.items()))]
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=directory)
+        with os.fdopen(fd, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, self.path)
+        self.last_write = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            self._write()
+
+
+def sink_from_spec(spec):
+    # 'log', 'jsonl:<path>' or 'prom:<path>'
+    kind, _, path = spec.partition(':')
+    if kind == 'log':
+        return LoggingSink()
+    if kind == 'jsonl' and path:
+        return JsonLinesSink(path)
+    if kind == 'prom' and path:
+        return PrometheusSink(path)
+    raise ValueError(f"Unknown metrics sink '{spec}'.")
+
+
+class capture:
+    # Opt-in deep capture around a block: cProfile and/or tracemalloc. While
+    # tracemalloc is running, every stage event also carries memory_delta.
+    #   with capture(profile_path='run.prof') as cap: ...
+    #   print(cap.report())
+
+    def __init__(self, profile=True, memory=True, profile_path=None):
+        import cProfile
+
+        self.profile = cProfile.Profile() if profile else None
+        self.memory = memory
+        self.profile_path = profile_path
+        self.snapshot = None
+        self.peak = None
+
+    def __enter__(self):
+        if self.memory:
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        if self.profile is not None:
+            self.profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profile is not None:
+            self.profile.disable()
+            if self.profile_path:
+                self.profile.dump_stats(self.profile_path)
+        if self.memory:
+            self.peak = tracemalloc.get_traced_memory()[1]
+            self.snapshot = tracemalloc.take_snapshot()
+            if self._started_tracing:
+                tracemalloc.stop()
+        return False
+
+    def report(self, top=15):
+        import pstats
+
+        lines = []
+        if self.profile is not None:
+            lines.append(f"Top {top} functions by cumulative time:")
+            stats = pstats.Stats(self.profile)
+            for func, (_, calls, _, cumulative, _) in sorted(stats.stats.items(), key=lambda kv: -kv[1][3])[:top]:
+                lines.append(f"  {cumulative * 1000:10.2f} ms  {calls:8d}  {pstats.func_std_string(func)}")
+        if self.snapshot is not None:
+            lines.append(f"Peak traced memory: {self.peak / (1 << 20):.1f} MB. Top {top} allocation sites:")
+            for stat in self.snapshot.statistics('lineno')[:top]:
+                lines.append(f"  {stat.size / 1024:10.1f} KiB  {stat.traceback}")
+        return "\n".join(lines)
+
+
+def configure_from_env(environ=None):
+    # NUTRITION_METRICS: comma-separated sink specs (see sink_from_spec).
+    # NUTRITION_PROFILE: a path; returns an entered capture() that writes cProfile stats there.
+    environ = os.environ if environ is None else environ
+    specs = [spec.strip() for spec in environ.get('NUTRITION_METRICS', '').split(',') if spec.strip()]
+    for spec in specs:
+        add_sink(sink_from_spec(spec))
+    if 'log' in specs:
+        import logging
+        logging.basicConfig(level=logging.INFO)
+    if environ.get('NUTRITION_PROFILE'):
+        return capture(profile_path=environ['NUTRITION_PROFILE']).__enter__()
+    return None
@@ -1,16 +1,122 @@
-from data_loader import load_and_process_data
-from health_score import compute_health_score, get_healthier_alternatives
-from caloric_needs import calculate_bmr, calculate_tdee
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from data_loader import load_and_process_data, DEFAULT_CACHE_DIR
+from health_score import SCORING_PROFILES, ScoringEngine, score_frame
+from shared_dataset import SharedMenu, submit_resolve, worker_pool
+
+# The bundled menu and its cache live next to this script, wherever it is run from.
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def read_chunks(stream, chunk_size):
+    # Lists of (line number, name); blank lines are skipped but still counted.
+    chunk = []
+    for lineno, line in enumerate(stream, 1):
+        name = line.strip()
+        if not name:
+            continue
+        chunk.append((lineno, name))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def resolve_stream(pool, chunks, top_n=3, ordered=True, max_pending=8):
+    # At most max_pending chunks are read ahead and in flight, so memory stays
+    # bounded however long the input is. Yields (line, query, result) tuples.
+    pending = deque()
+
+    def finished():
+        if ordered:
+            return [pending.popleft()]
+        done, _ = wait([future for _, future in pending], return_when=FIRST_COMPLETED)
+        entries = [entry for entry in pending if entry[1] in done]
+        for entry in entries:
+            pending.remove(entry)
+        return entries
+
+    for chunk in chunks:
+        pending.append((chunk, submit_resolve(pool, [name for _, name in chunk], top_n)))
+        while len(pending) >= max_pending:
+            for done_chunk, future in finished():
+                for (lineno, name), result in zip(done_chunk, future.result()):
+                    yield lineno, name, result
+    while pending:
+        for done_chunk, future in finished():
+            for (lineno, name), result in zip(done_chunk, future.result()):
+                yield lineno, name, result
+
+
+class JsonlWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, lineno, query, result):
+        record = {'line': lineno, 'query': query, 'found': result is not None}
+        if result is not None:
+            record.update(result)
+        self.stream.write(json.dumps(record) + "\n")
+
+
+class CsvWriter:
+    fields = ['line', 'query', 'item', 'company', 'health_score',
+              'rank', 'alternative', 'alternative_company', 'alternative_health_score']
+
+    def __init__(self, stream):
+        self.writer = csv.DictWriter(stream, fieldnames=self.fields)
+        self.writer.writeheader()
+
+    def write(self, lineno, query, result):
+        row = {'line': lineno, 'query': query}
+        if result is None:
+            self.writer.writerow(row)
+            return
+        row.update(item=result['item'], company=result['company'], health_score=result['health_score'])
+        if not result['alternatives']:
+            self.writer.writerow(row)
+        for rank, alt in enumerate(result['alternatives'], 1):
+            self.writer.writerow({**row, 'rank': rank, 'alternative': alt['item'],
+                                  'alternative_company': alt['company'],
+                                  'alternative_health_score': alt['health_score']})
+
 
 if __name__ == "__main__":
-    df, features = load_and_process_data("/Users/rishi/Projects Python/FastFoodChainAlternatives/FastFoodNutritionMenuV2.csv")
-    df_scored = compute_health_score(df.copy(), features)
-
-    # Example usage:
-    item = "Cheeseburger"
-    original, alternatives = get_healthier_alternatives(item, df, df_scored)
-    print("Original Item:\n", original)
-    if alternatives is not None:
-        print("\nHealthier Alternatives:\n", alternatives)
-    else:
-        print("\nNo healthier alternatives found.")
+    parser = argparse.ArgumentParser(description="Find healthier alternatives for a list of menu item names.")
+    parser.add_argument("items", nargs="?", default="-", help="File with one item name per line ('-' for stdin).")
+    parser.add_argument("--data", default=os.path.join(HERE, "FastFoodNutritionMenuV2.csv"))
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--profile", choices=sorted(SCORING_PROFILES), default="default")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--output", default="-", help="Output file ('-' for stdout).")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=2048)
+    parser.add_argument("--unordered", action="store_true",
+                        help="Write chunks as they finish instead of in input order.")
+    args = parser.parse_args()
+
+    df, features, df_raw = load_and_process_data(args.data, os.path.join(HERE, DEFAULT_CACHE_DIR), with_raw=True)
+    df_scored = score_frame(df, args.profile, ScoringEngine(df))
+    del df
+
+    source = sys.stdin if args.items == "-" else open(args.items, encoding="utf-8")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    writer = (JsonlWriter if args.format == "jsonl" else CsvWriter)(out)
+    try:
+        workers = args.workers or os.cpu_count()
+        with SharedMenu(df_raw, df_scored, features) as shared, worker_pool(shared, workers) as pool:
+            for lineno, query, result in resolve_stream(pool, read_chunks(source, args.chunk_size), args.top_n,
+                                                        not args.unordered, 2 * workers):
+                writer.write(lineno, query, result)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
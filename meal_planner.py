@@ -0,0 +1,440 @@
+import argparse
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from health_score import SCORING_PROFILES, weights_matrix
+from instrumentation import stage
+from schema import NUTRIENTS
+
+MEAL_SPLIT = (0.3, 0.35, 0.35)
+EXCLUDE_PATTERN = "drink|soda|coffee|juice|milk|packet|syrup|sauce"
+KCAL_PER_GRAM_PROTEIN = 4
+WEEK_TOTALS = ('calories', 'protein', 'fat', 'carbs', 'sodium')
+SEARCH_SHARE = 0.25
+
+
+MENU_KEYS = ['calories', 'protein', 'total_fat', 'carbs', 'fiber', 'sugars', 'sodium']
+MENU_COLUMNS = [NUTRIENTS[key] for key in MENU_KEYS]
+_EXCLUDE_RE = re.compile(EXCLUDE_PATTERN)
+
+
+def prepare_menu_arrays(labels, names, values):
+    # Numeric view of one chain's menu in raw units (values in MENU_COLUMNS
+    # order), with the same junk and drink filters the GUI has always applied,
+    # scored with the meal_plan profile.
+    values = np.abs(np.asarray(values, dtype=np.float64))
+    excluded = np.array([not isinstance(name, str) or _EXCLUDE_RE.search(name.lower()) is not None
+                         for name in names], dtype=bool)
+    keep = (
+        ~np.isnan(values).any(axis=1) &
+        (values[:, 0] > 100) &
+        (values[:, 1] > 10) &
+        (values[:, 2] < 80) &
+        ~excluded
+    )
+    labels = np.asarray(labels)[keep]
+    names = np.asarray(names, dtype=object)[keep]
+    values = values[keep]
+    score = values @ weights_matrix(MENU_COLUMNS, [SCORING_PROFILES['meal_plan']])[:, 0]
+
+    order = np.argsort(-score, kind='stable')
+    return {
+        'labels': labels[order],
+        'names': names[order],
+        'calories': values[order, 0],
+        'protein': values[order, 1],
+        'fat': values[order, 2],
+        'carbs': values[order, 3],
+        'sodium': values[order, 6],
+        'score': score[order],
+    }
+
+
+def prepare_menu(df_raw, chain):
+    with stage('plan.prepare_menu', rows=len(df_raw)) as s:
+        df_chain = df_raw[df_raw['Company'].str.lower() == chain.lower()]
+        menu = prepare_menu_arrays(df_chain.index.to_numpy(), df_chain['Item'].to_numpy(),
+                                   df_chain[MENU_COLUMNS].to_numpy(dtype=np.float64))
+        s['chain_rows'] = len(df_chain)
+        s['candidates'] = len(menu['names'])
+    return menu
+
+
+def prepare_chain_menu(menu_arrays, chain):
+    # prepare_menu over a schema-resolved MenuArrays: positional reads of the raw block.
+    with stage('plan.prepare_menu', rows=len(menu_arrays)) as s:
+        rows = menu_arrays.chain_rows(chain)
+        menu = prepare_menu_arrays(menu_arrays.labels[rows], menu_arrays.items[rows],
+                                   menu_arrays.block(MENU_KEYS, rows))
+        s['chain_rows'] = len(rows)
+        s['candidates'] = len(menu['names'])
+    return menu
+
+
+def _meets_ratio(calories, protein, min_protein_ratio):
+    return min_protein_ratio is None or KCAL_PER_GRAM_PROTEIN * protein >= min_protein_ratio * calories
+
+
+def _greedy(menu, rows, target, min_protein_ratio):
+    picked, names, total = [], set(), 0.0
+    for pos in rows:
+        cal = menu['calories'][pos]
+        if menu['names'][pos] in names or total + cal > target:
+            continue
+        if not _meets_ratio(cal, menu['protein'][pos], min_protein_ratio):
+            continue
+        picked.append(pos)
+        names.add(menu['names'][pos])
+        total += cal
+    return picked
+
+
+def _knapsack(weights, values, capacity):
+    best = np.zeros(capacity + 1)
+    keep = np.zeros((len(weights), capacity + 1), dtype=bool)
+    for i, (w, v) in enumerate(zip(weights, values)):
+        if w > capacity:
+            continue
+        candidate = best[:capacity + 1 - w] + v
+        better = candidate > best[w:]
+        keep[i, w:] = better
+        best[w:] = np.where(better, candidate, best[w:])
+
+    picked, c = [], capacity
+    for i in range(len(weights) - 1, -1, -1):
+        if keep[i, c]:
+            picked.append(i)
+            c -= weights[i]
+    return picked[::-1]
+
+
+def _solve(menu, rows, target, min_protein_ratio, resolution):
+    rows = np.asarray(rows, dtype=np.int64)
+    if len(rows) == 0:
+        return []
+    # One row per item name (the best scoring, since menus are score-ordered).
+    _, first = np.unique(menu['names'][rows], return_index=True)
+    rows = rows[np.sort(first)]
+    # Weights are rounded up so a solution never exceeds the real calorie target.
+    weights = np.maximum(1, np.ceil(menu['calories'][rows] / resolution)).astype(np.int64)
+    capacity = int(target // resolution)
+    score = menu['score'][rows]
+    slack = KCAL_PER_GRAM_PROTEIN * menu['protein'][rows] - (min_protein_ratio or 0) * menu['calories'][rows]
+
+    def run(lam):
+        picked = _knapsack(weights, score + lam * slack, capacity)
+        return picked, min_protein_ratio is None or slack[picked].sum() >= 0
+
+    picked, feasible = run(0.0)
+    if feasible:
+        return rows[picked].tolist()
+
+    # Lagrangian relaxation of the protein-ratio constraint: raise the price on
+    # slack until the DP optimum satisfies it, then bisect back toward the
+    # smallest price (highest true score) that still does.
+    lo, hi = 0.0, 1.0
+    for _ in range(30):
+        picked, feasible = run(hi)
+        if feasible:
+            break
+        lo, hi = hi, hi * 2
+    if not feasible:
+        return rows[picked].tolist()
+    best = picked
+    for _ in range(20):
+        mid = (lo + hi) / 2
+        picked, feasible = run(mid)
+        if feasible:
+            hi, best = mid, picked
+        else:
+            lo = mid
+    return rows[best].tolist()
+
+
+def plan_day(menu, tdee, mode='greedy', meal_split=MEAL_SPLIT, min_protein_ratio=None, resolution=10,
+             exclude=()):
+    if mode not in ('greedy', 'knapsack'):
+        raise ValueError(f"Unknown planner mode '{mode}'.")
+
+    used = np.isin(menu['names'], list(exclude)) if len(exclude) else np.zeros(len(menu['names']), dtype=bool)
+    meals = []
+    for share in meal_split:
+        target = share * tdee
+        rows = np.flatnonzero(~used)
+        with stage('plan.solve', mode=mode, candidates=len(rows)) as s:
+            if mode == 'greedy':
+                picked = _greedy(menu, rows, target, min_protein_ratio)
+            else:
+                picked = _solve(menu, rows, target, min_protein_ratio, resolution)
+            s['picked'] = len(picked)
+        for pos in picked:
+            used |= menu['names'] == menu['names'][pos]
+
+        meals.append({
+            'target': target,
+            'rows': picked,
+            'items': menu['names'][picked].tolist(),
+            'calories': float(menu['calories'][picked].sum()),
+            'protein': float(menu['protein'][picked].sum()),
+            'fat': float(menu['fat'][picked].sum()),
+            'carbs': float(menu['carbs'][picked].sum()),
+            'sodium': float(menu['sodium'][picked].sum()),
+            'score': float(menu['score'][picked].sum()),
+        })
+    return meals
+
+
+def format_plan(menu, meals):
+    lines = []
+    for i, meal in enumerate(meals):
+        lines.append(f"\nMeal {i+1} Suggestions:")
+        for pos in meal['rows']:
+            lines.append(f"{menu['names'][pos]} – {menu['calories'][pos]:.0f} cal")
+            lines.append(f"Protein: {menu['protein'][pos]:.1f}g | Fat: {menu['fat'][pos]:.1f}g | Carbs: {menu['carbs'][pos]:.1f}g")
+        lines.append(f"→ Meal Total: Protein: {meal['protein']:.1f}g | Fat: {meal['fat']:.1f}g | Carbs: {meal['carbs']:.1f}g")
+    return "\n".join(lines) + "\n"
+
+
+def _day_candidates(chain, menu, tdee, count=12, mode='knapsack', min_protein_ratio=None, variety_days=3, seed=0,
+                    deadline=None):
+    # Distinct one-day plans for one chain and calorie target, built in
+    # rotations of variety_days plans that share no item, so cycling through a
+    # rotation always satisfies the variety window. The first rotation starts
+    # from the plain optimum; later ones start by banning a random half of
+    # everything used so far. Returns (plans, complete); complete is False if
+    # the deadline, checked before each solve, cut generation short.
+    rng = np.random.default_rng(seed)
+    seen, used, out, rotation = set(), [], [], []
+    for _ in range(3 * count):
+        if deadline is not None and time.monotonic() > deadline:
+            return out, False
+        if rotation:
+            exclude = sorted(set().union(*(cand['names'] for cand in rotation)))
+        else:
+            exclude = rng.choice(used, size=len(used) // 2, replace=False) if used else ()
+        meals = plan_day(menu, tdee, mode, min_protein_ratio=min_protein_ratio, exclude=exclude)
+        names = frozenset(name for meal in meals for name in meal['items'])
+        if not names or names in seen:
+            rotation = []
+            continue
+        cand = {'chain': chain, 'tdee': tdee, 'meals': meals, 'names': names,
+                'score': sum(meal['score'] for meal in meals),
+                'totals': np.array([sum(meal[key] for meal in meals) for key in WEEK_TOTALS])}
+        seen.add(names)
+        used = sorted(set(used) | names)
+        out.append(cand)
+        rotation = rotation + [cand] if len(rotation) + 1 < variety_days else []
+        if len(out) == count:
+            break
+    return out, True
+
+
+def _candidate_job(chain, menu, tdee, count, mode, min_protein_ratio, variety_days, seed, deadline):
+    # Drop the per-meal row positions; the weekly plan only needs names and totals.
+    cands, complete = _day_candidates(chain, menu, tdee, count, mode, min_protein_ratio, variety_days, seed, deadline)
+    return [{**cand, 'meals': [{k: v for k, v in meal.items() if k != 'rows'} for meal in cand['meals']]}
+            for cand in cands], complete
+
+
+_bound = None
+
+
+def _week_worker_init(bound):
+    global _bound
+    _bound = bound
+
+
+def _search_week(week, first, deadline):
+    # Depth-first branch and bound over one candidate per day, starting from the
+    # given day-0 candidates. Prunes on the best score any worker has found
+    # (the shared _bound), on the weekly limits, and on the variety window.
+    days, variety = week['days'], week['variety_days']
+    lo, hi = week['lo'], week['hi']
+    best = {'score': -np.inf, 'choice': None, 'complete': True}
+    chosen = []
+    nodes = [0]
+    bound = [_bound.value]
+
+    def visit(day, score, totals):
+        nodes[0] += 1
+        # A clock read is cheap next to a node's NumPy work; the shared bound
+        # takes a lock, so it is refreshed less often.
+        if time.monotonic() > deadline:
+            best['complete'] = False
+            return False
+        if nodes[0] % 512 == 0:
+            bound[0] = max(bound[0], _bound.value)
+        if day == len(days):
+            if score > max(best['score'], bound[0]):
+                best['score'], best['choice'] = score, list(chosen)
+                with _bound.get_lock():
+                    if score > _bound.value:
+                        _bound.value = score
+                bound[0] = max(bound[0], score)
+            return True
+        recent = [days[d][c]['names'] for d, c in zip(range(day - 1, max(-1, day - variety), -1), reversed(chosen))]
+        for c in (first if day == 0 else range(len(days[day]))):
+            cand = days[day][c]
+            if score + cand['score'] + week['suffix_best'][day + 1] <= max(best['score'], bound[0]):
+                break
+            after = totals + cand['totals']
+            if np.any(after + week['suffix_min'][day + 1] > hi) or np.any(after + week['suffix_max'][day + 1] < lo):
+                continue
+            if any(cand['names'] & names for names in recent):
+                continue
+            chosen.append(c)
+            keep_going = visit(day + 1, score + cand['score'], after)
+            chosen.pop()
+            if not keep_going:
+                return False
+        return True
+
+    visit(0, 0.0, np.zeros(len(WEEK_TOTALS)))
+    return best
+
+
+def _week_bounds(days, limits):
+    lo = np.full(len(WEEK_TOTALS), -np.inf)
+    hi = np.full(len(WEEK_TOTALS), np.inf)
+    for key, (low, high) in (limits or {}).items():
+        if key not in WEEK_TOTALS:
+            raise ValueError(f"Unknown weekly limit '{key}'; expected one of {', '.join(WEEK_TOTALS)}.")
+        lo[WEEK_TOTALS.index(key)] = -np.inf if low is None else low
+        hi[WEEK_TOTALS.index(key)] = np.inf if high is None else high
+
+    # Suffix sums over the remaining days: best score, and the smallest and
+    # largest totals any choice of candidates could still add.
+    zeros = np.zeros(len(WEEK_TOTALS))
+    suffix_best, suffix_min, suffix_max = [0.0], [zeros], [zeros]
+    for cands in reversed(days):
+        totals = np.array([cand['totals'] for cand in cands])
+        suffix_best.insert(0, suffix_best[0] + max(cand['score'] for cand in cands))
+        suffix_min.insert(0, suffix_min[0] + totals.min(axis=0))
+        suffix_max.insert(0, suffix_max[0] + totals.max(axis=0))
+    return lo, hi, suffix_best, suffix_min, suffix_max
+
+
+def _timed_out(start):
+    return {'days': [], 'score': None, 'complete': False, 'totals': None, 'elapsed': time.monotonic() - start}
+
+
+def plan_week(menus, tdee, days=7, mode='knapsack', variety_days=3, limits=None, min_protein_ratio=None,
+              candidates_per_day=12, time_budget=10.0, workers=None, seed=0):
+    # menus: {chain: prepare_menu(...)}; tdee: one target or one per day.
+    # limits: weekly {total: (min, max)} over WEEK_TOTALS, e.g. {'sodium': (None, 16100)}.
+    # variety_days: an item may not appear again on any of the next variety_days - 1 days.
+    # Each day is planned from a single chain, chosen by the search.
+    # time_budget bounds the whole call: candidate generation stops (between
+    # solves) once all but SEARCH_SHARE of it is spent, and the search at the
+    # end of it. Returns the best plan found, or None if none is feasible;
+    # 'complete' says whether both phases finished, i.e. the plan is optimal
+    # over the full candidate set. If time ran out before any plan was found,
+    # the result has 'complete' False and no days.
+    # workers=0 runs everything in this process.
+    start = time.monotonic()
+    deadline = start + time_budget
+    generate_deadline = start + (1 - SEARCH_SHARE) * time_budget
+    tdees = [float(t) for t in (tdee if np.ndim(tdee) else [tdee] * days)]
+    workers = os.cpu_count() if workers is None else workers
+
+    jobs = [(chain, menus[chain], t, candidates_per_day, mode, min_protein_ratio, variety_days, seed,
+             generate_deadline) for chain in menus for t in dict.fromkeys(tdees)]
+    bound = multiprocessing.Value('d', -np.inf)
+    pool = None
+    if workers:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_week_worker_init, initargs=(bound,))
+    else:
+        _week_worker_init(bound)
+    try:
+        generated = list(pool.map(_candidate_job, *zip(*jobs))) if pool else [_candidate_job(*job) for job in jobs]
+        generated_all = all(complete for _, complete in generated)
+        by_tdee = {}
+        for (_, _, t, *_), (cands, _) in zip(jobs, generated):
+            by_tdee.setdefault(t, []).extend(cands)
+        day_cands = [sorted(by_tdee[t], key=lambda cand: -cand['score']) for t in tdees]
+        if any(not cands for cands in day_cands):
+            return None if generated_all else _timed_out(start)
+
+        lo, hi, suffix_best, suffix_min, suffix_max = _week_bounds(day_cands, limits)
+        week = {'days': day_cands, 'variety_days': max(1, variety_days), 'lo': lo, 'hi': hi,
+                'suffix_best': suffix_best, 'suffix_min': suffix_min, 'suffix_max': suffix_max}
+
+        # Day-0 candidates are dealt round-robin so every branch group starts
+        # with strong options and finds a good incumbent early.
+        groups = max(1, min(len(day_cands[0]), 4 * max(workers, 1)))
+        firsts = [list(range(g, len(day_cands[0]), groups)) for g in range(groups)]
+        if pool:
+            results = list(pool.map(_search_week, [week] * groups, firsts, [deadline] * groups))
+        else:
+            results = [_search_week(week, first, deadline) for first in firsts]
+    finally:
+        if pool:
+            pool.shutdown()
+
+    found = [result for result in results if result['choice'] is not None]
+    complete = generated_all and all(result['complete'] for result in results)
+    if not found:
+        return None if complete else _timed_out(start)
+    result = max(found, key=lambda result: result['score'])
+    plan_days = [{'day': d + 1, 'chain': day_cands[d][c]['chain'], 'tdee': tdees[d], 'meals': day_cands[d][c]['meals'],
+                  'score': day_cands[d][c]['score'],
+                  **dict(zip(WEEK_TOTALS, day_cands[d][c]['totals'].tolist()))}
+                 for d, c in enumerate(result['choice'])]
+    return {'days': plan_days, 'score': result['score'], 'complete': complete,
+            'totals': {key: sum(day[key] for day in plan_days) for key in WEEK_TOTALS},
+            'elapsed': time.monotonic() - start}
+
+
+def format_week(week):
+    if not week['days']:
+        return "Time budget reached before any weekly plan was found; try a larger --time-budget.\n"
+    lines = []
+    for day in week['days']:
+        lines.append(f"\nDay {day['day']} – {day['chain']} ({day['calories']:.0f} / {day['tdee']:.0f} cal, "
+                     f"sodium {day['sodium']:.0f} mg)")
+        for i, meal in enumerate(day['meals']):
+            lines.append(f"  Meal {i+1}: {', '.join(meal['items'])}")
+    totals = week['totals']
+    lines.append(f"\n→ Week Total: {totals['calories']:.0f} cal | Protein: {totals['protein']:.1f}g | "
+                 f"Fat: {totals['fat']:.1f}g | Carbs: {totals['carbs']:.1f}g | Sodium: {totals['sodium']:.0f} mg")
+    if not week['complete']:
+        lines.append("(time budget reached; best plan found so far)")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    from data_loader import load_and_process_data, DEFAULT_CACHE_DIR
+
+    parser = argparse.ArgumentParser(description="Recommend a full day (or week) of meals from fast food menus.")
+    parser.add_argument("chain")
+    parser.add_argument("tdee", type=float)
+    parser.add_argument("--data", default="FastFoodNutritionMenuV2.csv")
+    parser.add_argument("--mode", choices=["greedy", "knapsack"], default="knapsack")
+    parser.add_argument("--min-protein-ratio", type=float, default=None)
+    parser.add_argument("--week", action="store_true", help="Plan seven days instead of one.")
+    parser.add_argument("--also", nargs="*", default=[], help="More chains the weekly plan may use.")
+    parser.add_argument("--day-tdee", nargs=7, type=float, help="Per-day targets for the weekly plan.")
+    parser.add_argument("--variety-days", type=int, default=3)
+    parser.add_argument("--max-sodium", type=float, default=None, help="Weekly sodium budget in mg.")
+    parser.add_argument("--min-protein", type=float, default=None, help="Weekly protein minimum in g.")
+    parser.add_argument("--time-budget", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    _, _, df_raw = load_and_process_data(args.data, DEFAULT_CACHE_DIR, with_raw=True)
+    if not args.week:
+        menu = prepare_menu(df_raw, args.chain)
+        meals = plan_day(menu, args.tdee, args.mode, min_protein_ratio=args.min_protein_ratio)
+        print(format_plan(menu, meals))
+    else:
+        menus = {chain: prepare_menu(df_raw, chain) for chain in [args.chain, *args.also]}
+        limits = {'sodium': (None, args.max_sodium), 'protein': (args.min_protein, None)}
+        week = plan_week(menus, args.day_tdee or args.tdee, mode=args.mode, variety_days=args.variety_days,
+                         limits=limits, min_protein_ratio=args.min_protein_ratio,
+                         time_budget=args.time_budget, workers=args.workers)
+        print(format_week(week) if week is not None else "No weekly plan satisfies these limits.")
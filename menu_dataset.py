@@ -0,0 +1,134 @@
+import numpy as np
+
+from data_loader import FEATURES, load_and_process_data, merge_stats, remove_stats, standard_scaler_fit
+from dominance_index import DominanceIndex
+from health_score import DOMINANCE_COLUMNS, score_frame
+from name_index import NameIndex
+
+DRIFT_TOLERANCE = 0.02
+
+
+class MenuDataset:
+    # A loaded, scored and indexed menu that accepts row-level inserts, edits
+    # and deletes. Running mean/M2 are kept for the raw features; while they
+    # stay within `tolerance` of the statistics the standardized block was built
+    # with, only the touched rows are restandardized, rescored and patched into
+    # the name and dominance indexes. Beyond that, everything is rescaled once.
+
+    def __init__(self, df, df_raw, features=FEATURES, tolerance=DRIFT_TOLERANCE):
+        self.df = df
+        self.df_raw = df_raw
+        self.features = list(features)
+        self.tolerance = tolerance
+        self.generation = 0
+        self.next_label = int(df_raw.index.max()) + 1 if len(df_raw) else 0
+
+        raw = df_raw[self.features].to_numpy(dtype=np.float64)
+        self.count, self.mean, self.m2 = merge_stats(0, np.zeros(len(self.features)),
+                                                     np.zeros(len(self.features)), raw)
+        self.ref_mean, self.ref_scale = standard_scaler_fit(raw)
+        self._rebuild()
+
+    @classmethod
+    def load(cls, file_path, cache_dir=None, tolerance=DRIFT_TOLERANCE):
+        df, features, df_raw = load_and_process_data(file_path, cache_dir, with_raw=True)
+        return cls(df, df_raw, features, tolerance)
+
+    def _rebuild(self):
+        self.df_scored = score_frame(self.df)
+        self.name_index = NameIndex.from_frame(self.df)
+        self.dominance_index = DominanceIndex.from_frames(self.df, self.df_scored)
+
+    def _current_scale(self):
+        scale = np.sqrt(self.m2 / self.count) if self.count else np.ones(len(self.features))
+        scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0
+        return scale
+
+    def drift(self):
+        scale = self._current_scale()
+        mean_shift = np.abs(self.mean - self.ref_mean) / self.ref_scale
+        scale_shift = np.abs(scale / self.ref_scale - 1)
+        return float(max(mean_shift.max(), scale_shift.max()))
+
+    def _clean(self, rows):
+        import pandas as pd
+
+        rows = rows.copy()
+        cols = [col for col in self.features if col in rows.columns]
+        rows[cols] = rows[cols].apply(pd.to_numeric, errors='coerce')
+        return rows
+
+    def apply(self, inserts=None, edits=None, deletes=None):
+        # inserts: frame of new rows in raw units; edits: frame indexed by existing
+        # labels holding the changed columns; deletes: iterable of labels.
+        import pandas as pd
+
+        deletes = list(deletes) if deletes is not None else []
+        inserted_labels, edited_labels = [], []
+
+        if deletes:
+            self.count, self.mean, self.m2 = remove_stats(
+                self.count, self.mean, self.m2, self.df_raw.loc[deletes, self.features].to_numpy(dtype=np.float64))
+            self.df_raw = self.df_raw.drop(index=deletes)
+            self.df = self.df.drop(index=deletes)
+
+        if edits is not None and len(edits):
+            edits = self._clean(edits)
+            edited_labels = edits.index.tolist()
+            updated = self.df_raw.loc[edited_labels].copy()
+            for col in edits.columns:
+                updated[col] = edits[col]
+            new_edit_raw = updated[self.features].to_numpy(dtype=np.float64)
+            if np.isnan(new_edit_raw).any():
+                raise ValueError("Edits must leave every nutrient column numeric.")
+            old_edit_raw = self.df_raw.loc[edited_labels, self.features].to_numpy(dtype=np.float64)
+            self.count, self.mean, self.m2 = remove_stats(self.count, self.mean, self.m2, old_edit_raw)
+            self.count, self.mean, self.m2 = merge_stats(self.count, self.mean, self.m2, new_edit_raw)
+            self.df_raw.loc[edited_labels, updated.columns] = updated
+            for col in updated.columns:
+                if col not in self.features:
+                    self.df.loc[edited_labels, col] = updated[col]
+
+        if inserts is not None and len(inserts):
+            inserts = self._clean(inserts).dropna(subset=self.features)
+            inserts.index = pd.RangeIndex(self.next_label, self.next_label + len(inserts))
+            self.next_label += len(inserts)
+            inserts = inserts.reindex(columns=self.df_raw.columns)
+            inserted_labels = inserts.index.tolist()
+            self.count, self.mean, self.m2 = merge_stats(
+                self.count, self.mean, self.m2, inserts[self.features].to_numpy(dtype=np.float64))
+            self.df_raw = pd.concat([self.df_raw, inserts])
+            self.df = pd.concat([self.df, inserts])
+
+        drift = self.drift()
+        self.generation += 1
+        summary = {'inserted': len(inserted_labels), 'edited': len(edited_labels), 'deleted': len(deletes),
+                   'drift': drift, 'rescaled': drift > self.tolerance}
+
+        if summary['rescaled']:
+            self.ref_mean, self.ref_scale = self.mean.copy(), self._current_scale()
+            self.df[self.features] = self._standardize(self.df_raw[self.features].to_numpy(dtype=np.float64))
+            self._rebuild()
+            return summary
+
+        touched = edited_labels + inserted_labels
+        if touched:
+            self.df.loc[touched, self.features] = self._standardize(
+                self.df_raw.loc[touched, self.features].to_numpy(dtype=np.float64))
+        scores = score_frame(self.df.loc[touched])['Health_Score']
+        self.df_scored = pd.concat([self.df_scored.drop(index=deletes + edited_labels), scores]).reindex(self.df.index)
+
+        points = self.df.loc[touched, DOMINANCE_COLUMNS].to_numpy(dtype=np.float64)
+        for label in deletes:
+            self.name_index.remove(label)
+            self.dominance_index.delete(label)
+        for label, point in zip(edited_labels, points[:len(edited_labels)]):
+            self.name_index.update(label, self.df.at[label, 'Item'], self.df.at[label, 'Company'])
+            self.dominance_index.update(label, point, scores[label])
+        for label, point in zip(inserted_labels, points[len(edited_labels):]):
+            self.name_index.add(label, self.df.at[label, 'Item'], self.df.at[label, 'Company'])
+            self.dominance_index.insert(label, point, scores[label])
+        return summary
+
+    def _standardize(self, raw):
+        return (raw - self.ref_mean) / self.ref_scale
@@ -0,0 +1,239 @@
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy as np
+
+GRAM = 3
+
+EXACT, PREFIX, WORD, SUBSTRING = range(4)
+
+
+def _normalize(text):
+    return ' '.join(str(text).lower().split())
+
+
+def _grams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def _rank(name, q):
+    if name == q:
+        return EXACT
+    if name.startswith(q):
+        return PREFIX
+    if f" {q}" in name:
+        return WORD
+    return SUBSTRING
+
+
+def _candidates(q, postings):
+    # postings(gram) -> sorted row positions, or None for an unseen gram.
+    if len(q) <= GRAM:
+        rows = postings(q)
+        return np.empty(0, dtype=np.int32) if rows is None else rows
+    lists = []
+    for gram in _grams(q, GRAM):
+        rows = postings(gram)
+        if rows is None:
+            return np.empty(0, dtype=np.int32)
+        lists.append(rows)
+    lists.sort(key=len)
+    rows = lists[0]
+    for other in lists[1:]:
+        if len(rows) == 0:
+            break
+        rows = np.intersect1d(rows, other, assume_unique=True)
+    return rows
+
+
+def encode_strings(values):
+    # UTF-8 bytes of every value back to back, plus (len + 1) offsets; non-strings become ''.
+    encoded = [(v if isinstance(v, str) else '').encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+class NameIndex:
+    # Case-insensitive substring/prefix lookup over menu item names. Every 1..3
+    # character gram maps to the sorted row positions containing it, so short
+    # queries are a single dict hit and longer ones intersect their rarest
+    # trigrams before verifying the (small) candidate set.
+
+    def __init__(self, items, companies=None, labels=None):
+        self.names = [_normalize(item) if isinstance(item, str) else '' for item in items]
+        self.labels = np.asarray(labels if labels is not None else np.arange(len(self.names)))
+        self.companies = [_normalize(c) for c in companies] if companies is not None else None
+
+        postings = defaultdict(list)
+        for pos, name in enumerate(self.names):
+            for n in range(1, GRAM + 1):
+                for gram in _grams(name, n):
+                    postings[gram].append(pos)
+        self.postings = {gram: np.array(rows, dtype=np.int32) for gram, rows in postings.items()}
+
+        order = sorted(range(len(self.names)), key=lambda pos: (self.names[pos], pos))
+        self.sorted_names = [self.names[pos] for pos in order]
+        self.sorted_pos = np.array(order, dtype=np.int32)
+
+        self.company_rows = {}
+        if self.companies is not None:
+            by_company = defaultdict(list)
+            for pos, company in enumerate(self.companies):
+                by_company[company].append(pos)
+            self.company_rows = {c: np.array(rows, dtype=np.int32) for c, rows in by_company.items()}
+
+        self.positions = {label: pos for pos, label in enumerate(self.labels.tolist())}
+
+    @classmethod
+    def from_frame(cls, df, item_col='Item', company_col='Company'):
+        companies = df[company_col].fillna('').tolist() if company_col in df.columns else None
+        return cls(df[item_col].tolist(), companies, df.index.to_numpy())
+
+    def __len__(self):
+        return len(self.names)
+
+    def _candidates(self, q):
+        return _candidates(q, self.postings.get)
+
+    def _company_filter(self, rows, company):
+        if company is None or self.companies is None:
+            return rows
+        allowed = self.company_rows.get(_normalize(company))
+        if allowed is None:
+            return np.empty(0, dtype=np.int32)
+        return np.intersect1d(rows, allowed, assume_unique=True)
+
+    def rank(self, q, pos):
+        return _rank(self.names[pos], q)
+
+    def search_positions(self, query, limit=None, company=None):
+        q = _normalize(query)
+        if not q:
+            return []
+        rows = self._company_filter(self._candidates(q), company)
+        if len(q) > GRAM:
+            rows = [pos for pos in rows.tolist() if q in self.names[pos]]
+        else:
+            rows = rows.tolist()
+        rows.sort(key=lambda pos: (self.rank(q, pos), len(self.names[pos]), pos))
+        return rows[:limit] if limit is not None else rows
+
+    def search(self, query, limit=None, company=None):
+        return self.labels[self.search_positions(query, limit, company)]
+
+    def prefix_positions(self, query, limit=None):
+        q = _normalize(query)
+        start = bisect_left(self.sorted_names, q)
+        stop = start
+        end = len(self.sorted_names) if limit is None else min(len(self.sorted_names), start + limit)
+        while stop < end and self.sorted_names[stop].startswith(q):
+            stop += 1
+        return self.sorted_pos[start:stop].tolist()
+
+    def prefix(self, query, limit=None):
+        return self.labels[self.prefix_positions(query, limit)]
+
+    def add(self, label, item, company=None):
+        # New rows are appended, so every posting list stays sorted.
+        pos = len(self.names)
+        name = _normalize(item) if isinstance(item, str) else ''
+        self.names.append(name)
+        self.labels = np.append(self.labels, label)
+        self.positions[label] = pos
+        for n in range(1, GRAM + 1):
+            for gram in _grams(name, n):
+                rows = self.postings.get(gram)
+                self.postings[gram] = np.array([pos], dtype=np.int32) if rows is None else np.append(rows, pos)
+        i = bisect_left(self.sorted_names, name)
+        while i < len(self.sorted_names) and self.sorted_names[i] == name:
+            i += 1
+        self.sorted_names.insert(i, name)
+        self.sorted_pos = np.insert(self.sorted_pos, i, pos)
+        if self.companies is not None:
+            company = _normalize(company) if isinstance(company, str) else ''
+            self.companies.append(company)
+            rows = self.company_rows.get(company)
+            self.company_rows[company] = np.array([pos], dtype=np.int32) if rows is None else np.append(rows, pos)
+        return pos
+
+    def remove(self, label):
+        # Tombstones the row: its slot stays allocated but it matches nothing.
+        pos = self.positions.pop(label)
+        name = self.names[pos]
+        for n in range(1, GRAM + 1):
+            for gram in _grams(name, n):
+                rows = self.postings[gram]
+                self.postings[gram] = rows[rows != pos]
+        i = bisect_left(self.sorted_names, name)
+        while self.sorted_pos[i] != pos:
+            i += 1
+        del self.sorted_names[i]
+        self.sorted_pos = np.delete(self.sorted_pos, i)
+        if self.companies is not None:
+            rows = self.company_rows[self.companies[pos]]
+            self.company_rows[self.companies[pos]] = rows[rows != pos]
+        self.names[pos] = ''
+
+    def update(self, label, item, company=None):
+        self.remove(label)
+        return self.add(label, item, company)
+
+    def first(self, query, company=None):
+        rows = self.search_positions(query, 1, company)
+        return self.labels[rows[0]] if rows else None
+
+    def pack(self):
+        # Flat arrays for PackedNameIndex: normalized names as UTF-8 bytes plus
+        # offsets, the grams as a sorted fixed-width array and their postings
+        # concatenated, so the index can sit in shared memory.
+        name_bytes, name_offsets = encode_strings(self.names)
+        grams = sorted(self.postings)
+        gram_offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+        gram_offsets[1:] = np.cumsum([len(self.postings[gram]) for gram in grams])
+        postings = [self.postings[gram] for gram in grams]
+        return {
+            'name_bytes': name_bytes,
+            'name_offsets': name_offsets,
+            'grams': np.array(grams, dtype=f'U{GRAM}'),
+            'gram_offsets': gram_offsets,
+            'postings': np.concatenate(postings) if postings else np.empty(0, dtype=np.int32),
+        }
+
+
+class PackedNameIndex:
+    # Read-only NameIndex lookups over the arrays from NameIndex.pack(), which
+    # may be views into shared memory. Names are decoded only for candidate
+    # rows and results are row positions.
+
+    def __init__(self, arrays):
+        self.name_bytes = arrays['name_bytes']
+        self.name_offsets = arrays['name_offsets']
+        self.grams = arrays['grams']
+        self.gram_offsets = arrays['gram_offsets']
+        self.postings = arrays['postings']
+
+    def __len__(self):
+        return len(self.name_offsets) - 1
+
+    def name(self, pos):
+        return bytes(self.name_bytes[self.name_offsets[pos]:self.name_offsets[pos + 1]]).decode('utf-8')
+
+    def _postings(self, gram):
+        i = int(np.searchsorted(self.grams, gram))
+        if i == len(self.grams) or self.grams[i] != gram:
+            return None
+        return self.postings[self.gram_offsets[i]:self.gram_offsets[i + 1]]
+
+    def search_positions(self, query, limit=None):
+        q = _normalize(query)
+        if not q:
+            return []
+        names = {pos: self.name(pos) for pos in _candidates(q, self._postings).tolist()}
+        rows = [pos for pos, name in names.items() if len(q) <= GRAM or q in name]
+        rows.sort(key=lambda pos: (_rank(names[pos], q), len(names[pos]), pos))
+        return rows[:limit] if limit is not None else rows
+
+    def first(self, query):
+        rows = self.search_positions(query, 1)
+        return rows[0] if rows else None
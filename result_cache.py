@@ -0,0 +1,126 @@
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+def normalize_query(text):
+    return ' '.join(str(text).lower().split())
+
+
+def tdee_bucket(tdee, bucket_size=50):
+    return int(round(tdee / bucket_size) * bucket_size)
+
+
+def alternatives_key(item_name, top_n=3, profile='default', chain=None):
+    return ('alternatives', normalize_query(item_name), top_n, profile, normalize_query(chain or ''))
+
+
+def plan_key(chain, tdee, mode='knapsack', profile='meal_plan', bucket_size=50):
+    return ('plan', normalize_query(chain), tdee_bucket(tdee, bucket_size), mode, profile)
+
+
+class ResultCache:
+    # Size-bounded LRU with optional TTL and an optional pickle-per-entry disk
+    # tier. Every key is namespaced by the dataset version, so entries from a
+    # previous menu file are never served and simply age out.
+
+    def __init__(self, version, maxsize=1024, ttl=None, disk_dir=None):
+        self.version = version
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.disk_dir = os.path.join(disk_dir, version) if disk_dir else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.disk_hits = self.evictions = 0
+
+    def _disk_path(self, key):
+        digest = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.pkl")
+
+    def _expired(self, stored_at):
+        return self.ttl is not None and time.monotonic() - stored_at > self.ttl
+
+    def _read_disk(self, key):
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                stored_key, stored_at, value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return _MISSING
+        if stored_key != key or (self.ttl is not None and time.time() - stored_at > self.ttl):
+            return _MISSING
+        return value
+
+    def _write_disk(self, key, value):
+        os.makedirs(self.disk_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((key, time.time(), value), f)
+        os.replace(tmp, self._disk_path(key))
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self._expired(stored_at):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+        if self.disk_dir is not None:
+            value = self._read_disk(key)
+            if value is not _MISSING:
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._store(key, value)
+                return value
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+        if self.disk_dir is not None:
+            try:
+                self._write_disk(key, value)
+            except OSError:
+                pass
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self, memory_only=False):
+        # The disk tier goes too unless memory_only, or its entries would come back on the next get.
+        with self._lock:
+            self._entries.clear()
+        if self.disk_dir is not None and not memory_only:
+            shutil.rmtree(self.disk_dir, ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'version': self.version, 'size': len(self._entries), 'maxsize': self.maxsize,
+                'hits': self.hits, 'misses': self.misses, 'disk_hits': self.disk_hits,
+                'evictions': self.evictions, 'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,109 @@
+import re
+
+import numpy as np
+
+# Canonical nutrient keys in feature-block order, with the cleaned CSV column
+# each one resolves to.
+NUTRIENTS = {
+    'calories': 'Calories',
+    'total_fat': 'Total_Fat(g)',
+    'saturated_fat': 'Saturated_Fat(g)',
+    'trans_fat': 'Trans_Fat(g)',
+    'cholesterol': 'Cholesterol(mg)',
+    'sodium': 'Sodium_(mg)',
+    'carbs': 'Carbs(g)',
+    'fiber': 'Fiber(g)',
+    'sugars': 'Sugars(g)',
+    'protein': 'Protein(g)',
+}
+LABELS = {'company': 'Company', 'item': 'Item'}
+UNITS = {'calories': 'cal', 'cholesterol': 'mg', 'sodium': 'mg'}
+
+
+def clean_column(name):
+    return name.strip().replace('\n', '').replace(' ', '_')
+
+
+def _signature(name):
+    # 'Total Fat\n(g)', 'Total_Fat(g)' and 'total fat (g)' all become 'totalfatg'.
+    return re.sub(r'[^a-z]', '', name.lower())
+
+
+class MenuSchema:
+    # Canonical keys resolved once against a frame's columns: which column holds
+    # each nutrient and its position in the feature block, so the request path
+    # indexes arrays by position instead of searching column names.
+
+    def __init__(self, columns):
+        columns = list(columns)
+        by_signature = {_signature(col): col for col in columns}
+        self.columns, missing = {}, []
+        for key, name in {**LABELS, **NUTRIENTS}.items():
+            col = name if name in columns else by_signature.get(_signature(name))
+            if col is None:
+                missing.append(name)
+            else:
+                self.columns[key] = col
+        if missing:
+            raise ValueError(f"Menu data is missing required columns: {', '.join(missing)}.")
+
+        self.keys = list(NUTRIENTS)
+        self.features = [NUTRIENTS[key] for key in self.keys]
+        self.positions = {key: pos for pos, key in enumerate(self.keys)}
+
+    def renames(self):
+        # Source column -> canonical column name, for the columns spelled differently.
+        canonical = {**LABELS, **NUTRIENTS}
+        return {col: canonical[key] for key, col in self.columns.items() if col != canonical[key]}
+
+    def index(self, *keys):
+        return [self.positions[key] for key in keys]
+
+    def validate_block(self, block):
+        if block.ndim != 2 or block.shape[1] != len(self.keys):
+            raise ValueError(f"Feature block has shape {block.shape}; expected (rows, {len(self.keys)}).")
+        if not np.isfinite(block).all():
+            raise ValueError("Feature block contains missing or non-finite values.")
+        return block
+
+
+class MenuArrays:
+    # The loaded menu as contiguous arrays: the float64 feature block in raw
+    # units and standardized, plus row labels, item names and chain codes.
+    # frame/frame_raw keep the pandas views for the frame-based helpers.
+
+    def __init__(self, schema, labels, items, companies, raw, scaled, mean, scale, frame=None, frame_raw=None):
+        self.schema = schema
+        self.labels = np.asarray(labels)
+        self.items = np.asarray(items, dtype=object)
+        self.chains, self.chain_codes = np.unique(np.asarray(companies, dtype=str), return_inverse=True)
+        self.raw = schema.validate_block(np.ascontiguousarray(raw, dtype=np.float64))
+        self.scaled = np.ascontiguousarray(scaled, dtype=np.float64)
+        self.mean = np.asarray(mean)
+        self.scale = np.asarray(scale)
+        self.frame = frame
+        self.frame_raw = frame_raw
+        self.positions = {label: pos for pos, label in enumerate(self.labels.tolist())}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def column(self, key, scaled=False):
+        return (self.scaled if scaled else self.raw)[:, self.schema.positions[key]]
+
+    def block(self, keys, rows=None, scaled=False):
+        values = self.scaled if scaled else self.raw
+        cols = self.schema.index(*keys)
+        return values[:, cols] if rows is None else values[np.ix_(rows, cols)]
+
+    def rows(self, labels):
+        return np.array([self.positions[label] for label in labels], dtype=np.int64)
+
+    def chain_rows(self, chain):
+        lowered = [name.lower() for name in self.chains.tolist()]
+        if chain.lower() not in lowered:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.chain_codes == lowered.index(chain.lower()))
+
+    def unit(self, key):
+        return UNITS.get(key, 'g')
@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from data_loader import load_and_process_data, cache_path, dataset_version, memory_footprint, DEFAULT_CACHE_DIR
+from health_score import ScoringEngine, score_frame, get_healthier_alternatives
+from name_index import NameIndex
+from dominance_index import DominanceIndex
+from meal_planner import prepare_menu, plan_day
+from similarity import SimilarityIndex, get_closest_healthier_swaps
+from result_cache import ResultCache, alternatives_key, plan_key, tdee_bucket
+from instrumentation import add_sink, capture, clear_sinks, sink_from_spec
+
+MAX_HEADER_BYTES = 64 * 1024
+KEEP_ALIVE_TIMEOUT = 15
+MAX_RESULTS = 100
+
+_worker_df_raw = None
+_worker_menus = {}
+
+
+def _worker_init(data_path, cache_dir, compact):
+    global _worker_df_raw
+    _, _, _worker_df_raw = load_and_process_data(data_path, cache_dir, with_raw=True, compact=compact)
+
+
+def _worker_ready():
+    return os.getpid()
+
+
+def _plan_worker(chain, tdee, mode):
+    if chain not in _worker_menus:
+        _worker_menus[chain] = prepare_menu(_worker_df_raw, chain)
+    meals = plan_day(_worker_menus[chain], tdee, mode)
+    return [{k: v for k, v in meal.items() if k != 'rows'} for meal in meals]
+
+
+def _records(df, columns):
+    cols = [col for col in columns if col in df.columns]
+    return json.loads(df[cols].to_json(orient='records'))
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _count_param(params, name, default):
+    # A positive result count, capped at MAX_RESULTS.
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"Invalid '{name}' parameter.")
+    if value < 1:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"'{name}' must be at least 1.")
+    return min(value, MAX_RESULTS)
+
+
+class NutritionService:
+    def __init__(self, data_path, cache_dir=DEFAULT_CACHE_DIR, workers=None, compact=False,
+                 result_cache_size=4096, result_ttl=None, result_disk_dir=None):
+        self.df, self.features, self.df_raw = load_and_process_data(data_path, cache_dir, with_raw=True,
+                                                                    compact=compact)
+        self.scoring = ScoringEngine(self.df)
+        self.df_scored = score_frame(self.df, engine=self.scoring)
+        self.name_index = NameIndex.from_frame(self.df)
+        self.dominance_index = DominanceIndex.load_or_build(
+            os.path.join(cache_path(data_path, cache_dir), "dominance.npz"), self.df, self.df_scored)
+        self.similarity_index = SimilarityIndex.from_frames(self.df, self.df_scored, self.features)
+        self.chains = {chain.lower(): chain for chain in self.df['Company'].dropna().unique()}
+        # Forkserver workers never inherit the parent's sockets, and starting all
+        # of them here keeps the first /plan from paying for the data load.
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self.workers = workers or os.cpu_count()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_worker_init,
+                                        initargs=(data_path, cache_dir, compact),
+                                        mp_context=multiprocessing.get_context(start_method))
+        wait([self.pool.submit(_worker_ready) for _ in range(self.workers)])
+        self.inflight = {}
+        self.results = ResultCache(dataset_version(data_path, cache_dir), result_cache_size, result_ttl, result_disk_dir)
+
+    async def coalesce(self, key, make):
+        # Identical concurrent requests share one computation.
+        future = self.inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(make())
+            self.inflight[key] = future
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def offload(self, key, compute):
+        # Cache misses run on the loop's thread pool, so a scan or a similarity
+        # matmul doesn't stall every other connection.
+        body = self.results.get(key)
+        if body is None:
+            loop = asyncio.get_running_loop()
+            body = await self.coalesce(key, lambda: loop.run_in_executor(None, compute))
+            self.results.put(key, body)
+        return body
+
+    def items(self, params):
+        query = params.get('q', '')
+        limit = _count_param(params, 'limit', 20)
+        labels = self.name_index.search(query, limit, params.get('company'))
+        return {'query': query, 'items': _records(self.df_raw.loc[labels], ['Company', 'Item'] + self.features)}
+
+    async def alternatives(self, params):
+        item = params.get('item')
+        if not item:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Missing 'item' parameter.")
+        top_n = _count_param(params, 'top_n', 3)
+        profile = params.get('profile', 'default')
+        if profile not in self.scoring.profiles:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"Unknown scoring profile '{profile}'.")
+        key = alternatives_key(item, top_n, profile)
+        compute = lambda: self._alternatives(item, top_n, profile)
+        if profile == 'default' and top_n <= self.dominance_index.max_top_n:
+            # Answered from the stored dominance lists; cheap enough to stay on the loop.
+            body = self.results.get_or_compute(key, compute)
+        else:
+            body = await self.offload(key, compute)
+        if 'error' in body:
+            raise HttpError(HTTPStatus.NOT_FOUND, body['error'])
+        return body
+
+    def _alternatives(self, item, top_n, profile='default'):
+        # The dominance table is ordered by the default profile; other profiles
+        # rank the same dominating rows by their cached engine column.
+        if profile == 'default':
+            df_scored, dominance_index = self.df_scored, self.dominance_index
+        else:
+            df_scored, dominance_index = score_frame(self.df, profile, self.scoring), None
+        original, alternatives = get_healthier_alternatives(
+            item, self.df_raw, df_scored, top_n, self.name_index, dominance_index)
+        if original is None:
+            return {'error': alternatives}
+        columns = ['Company', 'Item'] + self.features
+        return {
+            'item': _records(original, columns)[0],
+            'alternatives': [] if alternatives is None else _records(alternatives, columns),
+        }
+
+    async def swaps(self, params):
+        item = params.get('item')
+        if not item:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Missing 'item' parameter.")
+        k = _count_param(params, 'k', 3)
+        same_chain = params.get('same_chain', '0').lower() in ('1', 'true', 'yes')
+        key = ('swaps', alternatives_key(item, k, 'similarity'), same_chain)
+        return await self.offload(key, lambda: self._swaps(item, k, same_chain))
+
+    def _swaps(self, item, k, same_chain):
+        swaps = get_closest_healthier_swaps([item], self.df_raw, self.df_scored, self.features, k, same_chain,
+                                            name_index=self.name_index, similarity_index=self.similarity_index)
+        columns = ['Company', 'Item', 'distance', 'Health_Score'] + self.features
+        return {'item': item, 'swaps': _records(swaps, columns)}
+
+    async def plan(self, params):
+        chain = self.chains.get(params.get('chain', '').lower())
+        if chain is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"Unknown chain '{params.get('chain')}'.")
+        try:
+            tdee = float(params['tdee'])
+        except (KeyError, ValueError):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Missing or invalid 'tdee' parameter.")
+        mode = params.get('mode', 'knapsack')
+        if mode not in ('greedy', 'knapsack'):
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"Unknown planner mode '{mode}'.")
+
+        key = plan_key(chain, tdee, mode)
+        meals = self.results.get(key)
+        if meals is None:
+            loop = asyncio.get_running_loop()
+            bucket = tdee_bucket(tdee)
+            meals = await self.coalesce(key, lambda: loop.run_in_executor(self.pool, _plan_worker, chain, bucket, mode))
+            self.results.put(key, meals)
+        return {'chain': chain, 'tdee': tdee, 'mode': mode, 'meals': meals}
+
+    async def dispatch(self, method, target):
+        if method != 'GET':
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, f"Method {method} not allowed.")
+        url = urlsplit(target)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if url.path == '/items':
+            return self.items(params)
+        if url.path == '/alternatives':
+            return await self.alternatives(params)
+        if url.path == '/swaps':
+            return await self.swaps(params)
+        if url.path == '/plan':
+            return await self.plan(params)
+        if url.path == '/health':
+            return {'status': 'ok', 'rows': len(self.df),
+                    'memory_bytes': {'scaled': memory_footprint(self.df), 'raw': memory_footprint(self.df_raw)},
+                    'result_cache': self.results.stats()}
+        raise HttpError(HTTPStatus.NOT_FOUND, f"No route for {url.path}.")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.respond(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                       {'error': 'Headers too large.'}, False)
+                    break
+
+                lines = head.decode('latin-1').split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST, {'error': 'Malformed request line.'}, False)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                    if length < 0:
+                        raise ValueError
+                except ValueError:
+                    # Without a usable length the next request can't be framed, so close.
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST, {'error': 'Invalid Content-Length.'}, False)
+                    break
+                if length:
+                    try:
+                        await reader.readexactly(length)
+                    except (asyncio.IncompleteReadError, ConnectionError):
+                        break
+
+                try:
+                    status, body = HTTPStatus.OK, await self.dispatch(method, target)
+                except HttpError as e:
+                    status, body = e.status, {'error': str(e)}
+                except ValueError as e:
+                    status, body = HTTPStatus.BAD_REQUEST, {'error': str(e)}
+                except Exception:
+                    logging.getLogger('nutrition.server').exception("Error handling %s %s", method, target)
+                    status, body = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': 'Internal server error.'}
+                await self.respond(writer, status, body, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, body, keep_alive):
+        payload = json.dumps(body).encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + payload)
+        await writer.drain()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve item lookups, alternatives and meal plans over HTTP.")
+    parser.add_argument("--data", default="FastFoodNutritionMenuV2.csv")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--compact", action="store_true", help="Use categorical/float32 columns to cut memory.")
+    parser.add_argument("--result-cache-size", type=int, default=4096)
+    parser.add_argument("--result-ttl", type=float, default=None, help="Seconds before a cached result expires.")
+    parser.add_argument("--result-disk-dir", default=None, help="Also persist cached results under this directory.")
+    parser.add_argument("--metrics", action="append", default=[],
+                        help="Stage metrics sink: log, jsonl:<path> or prom:<path>. Repeatable.")
+    parser.add_argument("--profile", default=None, help="Write cProfile stats for the whole run to this path.")
+    args = parser.parse_args()
+
+    for spec in args.metrics:
+        add_sink(sink_from_spec(spec))
+    if 'log' in args.metrics:
+        logging.basicConfig(level=logging.INFO)
+    profiling = capture(memory=False, profile_path=args.profile).__enter__() if args.profile else None
+
+    service = NutritionService(args.data, workers=args.workers, compact=args.compact,
+                               result_cache_size=args.result_cache_size, result_ttl=args.result_ttl,
+                               result_disk_dir=args.result_disk_dir)
+    if args.compact:
+        for name, frame in (('scaled', service.df), ('raw', service.df_raw)):
+            footprint = frame.attrs['memory_footprint']
+            print(f"{name} frame: {footprint['before']} -> {footprint['after']} bytes")
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        if profiling is not None:
+            profiling.__exit__(None, None, None)
+        clear_sinks()
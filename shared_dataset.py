@@ -0,0 +1,140 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from health_score import DOMINANCE_COLUMNS, dominance_mask
+from name_index import NameIndex, PackedNameIndex, encode_strings
+
+
+class SharedMenu:
+    # Parent side: copies the scored menu once into named shared-memory blocks,
+    # together with a NameIndex built here once and packed into flat arrays.
+    # The descriptor is a small picklable dict that workers pass to attach().
+
+    def __init__(self, df_raw, df_scored, features):
+        companies, company_codes = np.unique(df_raw['Company'].fillna('').astype(str).to_numpy(), return_inverse=True)
+        items = df_raw['Item'].tolist()
+        item_bytes, item_offsets = encode_strings(items)
+        arrays = {
+            'labels': df_raw.index.to_numpy(dtype=np.int64),
+            'raw': df_raw[features].to_numpy(dtype=np.float64),
+            'dominance': df_raw[DOMINANCE_COLUMNS].to_numpy(dtype=np.float64),
+            'health': df_scored['Health_Score'].reindex(df_raw.index).to_numpy(dtype=np.float64),
+            'company_codes': company_codes.astype(np.int32),
+            'item_bytes': item_bytes,
+            'item_offsets': item_offsets,
+            **{f'index_{key}': array for key, array in NameIndex(items).pack().items()},
+        }
+        self.blocks = []
+        self.descriptor = {'features': list(features), 'companies': companies.tolist(), 'arrays': {}}
+        for name, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.descriptor['arrays'][name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AttachedMenu:
+    # Worker side: read-only NumPy views over the parent's blocks, no copies.
+
+    def __init__(self, descriptor):
+        self.features = descriptor['features']
+        self.companies = descriptor['companies']
+        self._blocks = []
+        for name, (shm_name, shape, dtype) in descriptor['arrays'].items():
+            block = _attach_block(shm_name)
+            view = np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=block.buf)
+            view.flags.writeable = False
+            setattr(self, name, view)
+            self._blocks.append(block)
+        self._name_index = PackedNameIndex({name[len('index_'):]: getattr(self, name)
+                                            for name in descriptor['arrays'] if name.startswith('index_')})
+
+    def __len__(self):
+        return len(self.labels)
+
+    def item(self, pos):
+        return bytes(self.item_bytes[self.item_offsets[pos]:self.item_offsets[pos + 1]]).decode('utf-8')
+
+    def alternatives(self, positions, top_n=3, chunk_bytes=64 << 20):
+        # Same dominance filter, ordering and per-cell row budget as
+        # get_healthier_alternatives_batch, over the shared dominance block.
+        positions = np.asarray(positions, dtype=np.int64)
+        chunk = max(1, chunk_bytes // (18 * max(len(self), 1)))
+        results = []
+        for start in range(0, len(positions), chunk):
+            mask = dominance_mask(self.dominance, self.dominance[positions[start:start + chunk]])
+            for row in mask:
+                cand = np.flatnonzero(row)
+                results.append(cand[np.lexsort((cand, -self.health[cand]))][:top_n])
+        return results
+
+    def name_index(self):
+        # Searches the parent's packed index in place; results are row positions.
+        return self._name_index
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+        self._blocks = []
+
+
+def _attach_block(name):
+    # Pool workers inherit the parent's resource tracker, so on Pythons without
+    # track= their re-registration is a no-op and unlinking stays with the parent.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+_attached = None
+
+
+def _worker_attach(descriptor):
+    global _attached
+    _attached = AttachedMenu(descriptor)
+
+
+@lru_cache(maxsize=65536)
+def _resolve_name(name, top_n):
+    # Order-line item names repeat heavily, so each worker memoizes per name.
+    pos = _attached.name_index().first(name)
+    if pos is None:
+        return None
+    alts = _attached.alternatives([pos], top_n)[0]
+    return {'source': int(_attached.labels[pos]), 'item': _attached.item(pos),
+            'company': _attached.companies[_attached.company_codes[pos]],
+            'health_score': float(_attached.health[pos]),
+            'alternatives': [{'index': int(_attached.labels[alt]), 'item': _attached.item(alt),
+                              'company': _attached.companies[_attached.company_codes[alt]],
+                              'health_score': float(_attached.health[alt])} for alt in alts]}
+
+
+def _resolve_job(names, top_n):
+    return [_resolve_name(name, top_n) for name in names]
+
+
+def worker_pool(shared, processes=None):
+    return ProcessPoolExecutor(max_workers=processes or os.cpu_count(),
+                               initializer=_worker_attach, initargs=(shared.descriptor,))
+
+
+def submit_resolve(pool, names, top_n=3):
+    # Future for one chunk of free-text item names -> matched item and alternatives (or None).
+    return pool.submit(_resolve_job, list(names), top_n)
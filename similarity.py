@@ -0,0 +1,98 @@
+import numpy as np
+
+from health_score import DOMINANCE_COLUMNS, dominance_mask, find_item
+
+
+class SimilarityIndex:
+    # Blocked brute-force kNN over the standardized feature vectors. With ten
+    # dense dimensions a tree buys little, while one (block, n) distance matrix
+    # per batch of queries keeps the work in BLAS and the memory bounded.
+
+    def __init__(self, vectors, health, labels, companies=None, dominance_values=None):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float64)
+        self.norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+        self.health = np.asarray(health, dtype=np.float64)
+        self.labels = np.asarray(labels)
+        self.positions = {label: pos for pos, label in enumerate(self.labels.tolist())}
+        self.dominance_values = dominance_values
+        if companies is not None:
+            self.chain_names, self.chains = np.unique(np.asarray(companies, dtype=str), return_inverse=True)
+        else:
+            self.chains = None
+
+    @classmethod
+    def from_frames(cls, df, df_scored, features):
+        health = df_scored['Health_Score'].reindex(df.index).to_numpy(dtype=np.float64)
+        return cls(df[features].to_numpy(dtype=np.float64), health, df.index.to_numpy(),
+                   df['Company'].fillna('').to_numpy(), df[DOMINANCE_COLUMNS].to_numpy(dtype=np.float64))
+
+    def query_positions(self, positions, k=3, same_chain=False, require_dominance=False, chunk_bytes=64 << 20):
+        # For each query row: the k nearest rows with a higher Health_Score,
+        # as (positions, distances) arrays of shape (len(positions), k), -1/inf padded.
+        positions = np.asarray(positions, dtype=np.int64)
+        n = len(self.vectors)
+        out_pos = np.full((len(positions), k), -1, dtype=np.int64)
+        out_dist = np.full((len(positions), k), np.inf)
+        # Peak per (query, row) cell: the float64 distance block plus the int64
+        # argpartition result (16 bytes); the bool masks are freed before that.
+        block = max(1, chunk_bytes // (16 * max(n, 1)))
+        for start in range(0, len(positions), block):
+            q = positions[start:start + block]
+            d2 = self.vectors[q] @ self.vectors.T
+            d2 *= -2
+            d2 += self.norms[None, :]
+            d2 += self.norms[q][:, None]
+            invalid = self.health[None, :] <= self.health[q][:, None]
+            if same_chain and self.chains is not None:
+                invalid |= self.chains[None, :] != self.chains[q][:, None]
+            if require_dominance:
+                invalid |= ~dominance_mask(self.dominance_values, self.dominance_values[q])
+            d2[invalid] = np.inf
+            del invalid
+
+            kk = min(k, d2.shape[1])
+            part = np.argpartition(d2, kk - 1, axis=1)[:, :kk] if kk < d2.shape[1] else np.tile(np.arange(kk), (len(q), 1))
+            dist = np.take_along_axis(d2, part, axis=1)
+            order = np.argsort(dist, axis=1, kind='stable')
+            part = np.take_along_axis(part, order, axis=1)
+            dist = np.take_along_axis(dist, order, axis=1)
+            found = np.isfinite(dist)
+            out_pos[start:start + len(q), :kk] = np.where(found, part, -1)
+            out_dist[start:start + len(q), :kk] = np.sqrt(np.maximum(dist, 0))
+        return out_pos, out_dist
+
+    def closest(self, label, k=3, same_chain=False, require_dominance=False):
+        pos, dist = self.query_positions([self.positions[label]], k, same_chain, require_dominance)
+        keep = pos[0] >= 0
+        return self.labels[pos[0][keep]], dist[0][keep]
+
+
+def get_closest_healthier_swaps(items, df_original, df_scored, features, k=3, same_chain=False,
+                                require_dominance=False, name_index=None, similarity_index=None):
+    if similarity_index is None:
+        similarity_index = SimilarityIndex.from_frames(df_original, df_scored, features)
+
+    queries, sources = [], []
+    for item_name in items:
+        item_data = find_item(item_name, df_original, name_index)
+        if item_data is not None:
+            queries.append(item_name)
+            sources.append(similarity_index.positions[item_data.name])
+
+    pos, dist = similarity_index.query_positions(sources, k, same_chain, require_dominance)
+    rows, out_query, out_source, out_rank, out_dist = [], [], [], [], []
+    for i, (p, d) in enumerate(zip(pos, dist)):
+        keep = p >= 0
+        rows.extend(similarity_index.labels[p[keep]].tolist())
+        out_query.extend([queries[i]] * keep.sum())
+        out_source.extend([similarity_index.labels[sources[i]]] * keep.sum())
+        out_rank.extend(range(1, keep.sum() + 1))
+        out_dist.extend(d[keep].tolist())
+
+    result = df_original.loc[rows].copy()
+    result.insert(0, 'rank', out_rank)
+    result.insert(0, 'source_index', out_source)
+    result.insert(0, 'query', out_query)
+    result['distance'] = out_dist
+    result['Health_Score'] = df_scored['Health_Score'].reindex(rows).to_numpy()
+    return result
@@ -0,0 +1,67 @@
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ['pandas', 'sklearn', 'scipy', 'pyarrow']
+
+
+def measure(module):
+    # Runs `python -X importtime -c "import <module>"` in a fresh interpreter.
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        entries.append({'module': name.strip(), 'self_us': int(self_us), 'cumulative_us': int(cumulative_us)})
+
+    imported = {entry['module'] for entry in entries}
+    return {
+        'module': module,
+        'total_ms': sum(entry['self_us'] for entry in entries) / 1000,
+        'heavy_imports': [name for name in HEAVY_MODULES if name in imported],
+        'top': sorted(entries, key=lambda entry: -entry['cumulative_us'])[:20],
+    }
+
+
+def format_report(results, baseline=None):
+    lines = []
+    for result in results:
+        line = f"{result['module']:<16} {result['total_ms']:8.1f} ms"
+        if baseline and result['module'] in baseline:
+            delta = result['total_ms'] - baseline[result['module']]['total_ms']
+            line += f"  ({delta:+.1f} ms vs baseline)"
+        if result['heavy_imports']:
+            line += f"  heavy: {', '.join(result['heavy_imports'])}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report per-module import time for the project's entry points.")
+    parser.add_argument("modules", nargs="*", default=["main", "gui", "server", "data_loader", "health_score"])
+    parser.add_argument("--json", dest="json_path", help="Write the full report to this file.")
+    parser.add_argument("--baseline", help="Compare against a report previously written with --json.")
+    parser.add_argument("--top", type=int, default=0, help="Also list the N slowest imports per module.")
+    args = parser.parse_args()
+
+    results = [measure(module) for module in args.modules]
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {result['module']: result for result in json.load(f)}
+
+    print(format_report(results, baseline))
+    if args.top:
+        for result in results:
+            print(f"\n{result['module']}:")
+            for entry in result['top'][:args.top]:
+                print(f"  {entry['cumulative_us'] / 1000:8.1f} ms  {entry['module']}")
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)